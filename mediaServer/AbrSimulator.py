@@ -0,0 +1,473 @@
+# AbrSimulator.py
+# SemantEncoder가 만든 master/해상도별 m3u8과 대역폭 트레이스로 RaABR/NaABR 재생을 가상 시간에서 재현
+# (runTrace.js + Chrome CDP로 트레이스 하나를 실제 시간만큼 재생하던 평가를 대신함)
+#
+#   python AbrSimulator.py --trace ../surveillanceServer/trace/semantic_trace.txt \
+#                          --playlist ./output/hls --policy RaABR NaABR --output result.json
+#
+# 트레이스 × 플레이리스트 × 정책 조합을 프로세스 풀에서 병렬로 실행하고, 조합마다
+# 리버퍼링(시간/횟수), 시작 지연, 평균 bitrate와 risk level별 bitrate, 화질 전환 횟수를 JSON으로 출력
+#
+# 플레이어 모델은 surveillanceServer/hls.js의 컨트롤러와 EWMA_CleanDASS.html 설정을 따름
+#   - 세그먼트를 하나씩 순서대로 받고, 버퍼가 max_buffer(maxBufferLength) 이상이면 줄어들 때까지 대기
+#   - 다운로드 시간 = 요청 지연(latency, runTrace.js의 emulateNetworkConditions) + 트레이스 대역폭으로 전송
+#   - 다운로드가 끝날 때마다 hls.js EwmaBandWidthEstimator에 샘플을 넣고, 세그먼트의 NEXT-SEMANTICLEVEL을 기억
+#   - VOD 기준 (모든 세그먼트가 처음부터 존재), 첫 세그먼트가 들어오면 재생 시작
+
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+
+# ---------------------------------------------------------------- 트레이스
+
+class BandwidthTrace ():
+    # [(구간 길이(초), 대역폭(kbps))] 구간 목록. 트레이스가 끝난 뒤에는 마지막 대역폭이 유지됨
+    # (runTrace.js도 마지막 emulateNetworkConditions 설정을 그대로 둔 채 다운로드를 기다림)
+    def __init__ (self, chunks, name="trace"):
+        if not chunks:
+            raise ValueError(f"[!] Empty bandwidth trace: {name}")
+        self.name = name
+        self.chunks = chunks
+        self.ends = list(itertools.accumulate(duration for duration, _ in chunks))
+
+    @classmethod
+    def load(cls, path, mode="runtrace"):
+        # "<시각 ms> <대역폭 kbps>" 줄 형식 (trace/semantic_trace.txt)
+        #   mode="runtrace": runTrace.js parseTrace와 같은 규칙 (두 줄씩 짝지어 구간을 만듦, 기존 실험 재현용)
+        #   mode="step"    : 각 줄의 대역폭이 다음 줄 시각까지 유지
+        with open(path) as f:
+            trace = [[float(value) for value in line.split()] for line in f.read().strip().split("\n") if line.strip()]
+
+        chunks = []
+        if mode == "runtrace":
+            if len(trace) >= 1 and trace[0][0] > 0:
+                chunks.append((trace[0][0] / 1000, trace[0][1]))
+            for i in range(0, len(trace) - 1, 2):
+                chunks.append(((trace[i + 1][0] - trace[i][0]) / 1000, trace[i][1]))
+        elif mode == "step":
+            if trace and trace[0][0] > 0:
+                chunks.append((trace[0][0] / 1000, trace[0][1]))
+            for (t1, kbps), (t2, _) in zip(trace, trace[1:]):
+                chunks.append(((t2 - t1) / 1000, kbps))
+            chunks.append((1.0, trace[-1][1]))
+        else:
+            raise ValueError(f"[!] trace mode must be one of runtrace/step. got={mode}")
+        return cls([(duration, kbps) for duration, kbps in chunks if duration > 0], name=Path(path).name)
+
+    def bandwidth_at(self, t):
+        # t(초) 시점의 대역폭 (kbps)
+        for end, (_, kbps) in zip(self.ends, self.chunks):
+            if t < end:
+                return kbps
+        return self.chunks[-1][1]
+
+    def transferred(self, start, end):
+        # start~end(초) 동안 전송할 수 있는 바이트 수
+        bits = 0.0
+        t = start
+        for chunk_end, (_, kbps) in zip(self.ends, self.chunks):
+            if t >= end:
+                break
+            if chunk_end > t:
+                bits += kbps * 1000 * (min(chunk_end, end) - t)
+                t = min(chunk_end, end)
+        if t < end:
+            bits += self.chunks[-1][1] * 1000 * (end - t)
+        return bits / 8
+
+    def transfer_end(self, start, n_bytes):
+        # start(초)부터 n_bytes를 받기 시작했을 때 전송이 끝나는 시각 (구간마다 대역폭을 바꿔 가며 적분)
+        remaining = n_bytes * 8
+        t = start
+        k = 0
+        while k < len(self.ends) and self.ends[k] <= t:
+            k += 1
+        while k < len(self.ends):
+            bps = self.chunks[k][1] * 1000
+            span = self.ends[k] - t
+            if bps > 0 and bps * span >= remaining:
+                return t + remaining / bps
+            remaining -= bps * span
+            t = self.ends[k]
+            k += 1
+        bps = self.chunks[-1][1] * 1000
+        if bps <= 0:
+            return math.inf
+        return t + remaining / bps
+
+
+# ---------------------------------------------------------------- 플레이리스트
+
+class Level ():
+    def __init__ (self, name, bandwidth, segments):
+        self.name = name
+        self.bandwidth = bandwidth
+        self.segments = segments  # [{"duration", "size", "level", "next_level", "privacy", "gap"}]
+        self.privacy = "_privacy" in name
+
+
+def parse_attributes(text):
+    # BANDWIDTH=...,NAME="480p_privacy" → dict (따옴표 안의 쉼표 허용)
+    return {key: value.strip('"') for key, value in re.findall(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)', text)}
+
+
+def load_media_playlist(path):
+    segments = []
+    tags = {}
+    for line in Path(path).read_text().splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#EXTINF:"):
+            tags["duration"] = float(line[len("#EXTINF:"):].split(",")[0])
+        elif line.startswith("#EXT-X-SEMANTICLEVEL:"):
+            tags["level"] = int(float(line.split(":", 1)[1]))
+        elif line.startswith("#EXT-X-NEXT-SEMANTICLEVEL:"):
+            tags["next_level"] = int(float(line.split(":", 1)[1]))
+        elif line.startswith("#EXT-X-PRIVACY:"):
+            tags["privacy"] = int(float(line.split(":", 1)[1]))
+        elif line == "#EXT-X-GAP":
+            tags["gap"] = True
+        elif not line.startswith("#"):
+            media_path = Path(path).parent / line
+            gap = tags.get("gap", False) or not media_path.exists()
+            segments.append({
+                "duration": tags.get("duration", 0.0),
+                "size": 0 if gap else media_path.stat().st_size,
+                "level": tags.get("level"),
+                "next_level": tags.get("next_level"),
+                "privacy": tags.get("privacy", 0),
+                "gap": gap,
+            })
+            tags = {}
+    return segments
+
+
+@lru_cache(maxsize=None)
+def load_levels(playlist_dir):
+    # master.m3u8의 variant를 hls.js처럼 bitrate 오름차순으로 정렬한 Level 목록 (세그먼트가 없는 variant는 제외)
+    master_path = Path(playlist_dir) / "master.m3u8"
+    lines = [line.strip() for line in master_path.read_text().splitlines()]
+    levels = []
+    for i, line in enumerate(lines):
+        if not line.startswith("#EXT-X-STREAM-INF:"):
+            continue
+        attributes = parse_attributes(line[len("#EXT-X-STREAM-INF:"):])
+        uri = next(candidate for candidate in lines[i + 1:] if candidate and not candidate.startswith("#"))
+        segments = load_media_playlist(master_path.parent / uri)
+        if not segments:
+            print(f"[i] Skipping empty variant {uri}", file=sys.stderr)
+            continue
+        levels.append(Level(attributes.get("NAME", Path(uri).stem), int(attributes["BANDWIDTH"]), segments))
+    if not levels:
+        raise ValueError(f"[!] No playable variants in {master_path}")
+    levels.sort(key=lambda level: level.bandwidth)
+    return levels
+
+
+# ---------------------------------------------------------------- 대역폭 추정 (hls.js EwmaBandWidthEstimator)
+
+class Ewma ():
+    def __init__ (self, half_life):
+        self.alpha = math.exp(math.log(0.5) / half_life) if half_life else 0.0
+        self.estimate = 0.0
+        self.total_weight = 0.0
+
+    def sample(self, weight, value):
+        adj_alpha = self.alpha ** weight
+        self.estimate = value * (1 - adj_alpha) + adj_alpha * self.estimate
+        self.total_weight += weight
+
+    def get_estimate(self):
+        if self.alpha:
+            zero_factor = 1 - self.alpha ** self.total_weight
+            if zero_factor:
+                return self.estimate / zero_factor
+        return self.estimate
+
+
+class EwmaBandwidthEstimator ():
+    # 기본값은 EWMA_CleanDASS.html의 Hls 설정 (abrEwmaFastVoD 0.1, abrEwmaSlowVoD 1.0, abrEwmaDefaultEstimate 5e5)
+    def __init__ (self, slow=1.0, fast=0.1, default_estimate=500000, default_ttfb_ms=100):
+        self.slow = Ewma(slow)
+        self.fast = Ewma(fast)
+        self.default_estimate = default_estimate
+        self.default_ttfb_ms = default_ttfb_ms  # 컨트롤러가 sampleTTFB를 부르지 않으므로 항상 기본값
+        self.min_weight = 0.001
+        self.min_delay_ms = 50
+
+    def sample(self, duration_ms, n_bytes):
+        duration_s = max(duration_ms, self.min_delay_ms) / 1000
+        bps = 8 * n_bytes / duration_s
+        self.fast.sample(duration_s, bps)
+        self.slow.sample(duration_s, bps)
+
+    def can_estimate(self):
+        return self.fast.total_weight >= self.min_weight
+
+    def get_estimate(self):
+        if self.can_estimate():
+            return min(self.fast.get_estimate(), self.slow.get_estimate())
+        return self.default_estimate
+
+
+# ---------------------------------------------------------------- ABR 정책 (hls.js/src/controller 포팅)
+
+def highest_fitting(levels, indices, bw, start=None):
+    # indices[start]부터 아래로 내려가며 bitrate <= bw인 첫 레벨, 없으면 가장 낮은 후보
+    start = len(indices) - 1 if start is None else min(start, len(indices) - 1)
+    for i in range(start, -1, -1):
+        if levels[indices[i]].bandwidth <= bw:
+            return indices[i]
+    return indices[0]
+
+
+def clear_indices(levels):
+    indices = [k for k, level in enumerate(levels) if not level.privacy]
+    return indices or list(range(len(levels)))
+
+
+def group_indices(levels, next_level):
+    # privacy 컨트롤러: NEXT-SEMANTICLEVEL이 0, 1이면 privacy 스트림, 2 이상이거나 모르면 clear 스트림
+    want_privacy = next_level is not None and next_level < 2
+    indices = [k for k, level in enumerate(levels) if level.privacy == want_privacy]
+    return indices or list(range(len(levels)))
+
+
+def na_abr(levels, bw, next_level):
+    # basic/abr-controller_NaABR.ts: clear 스트림 중 대역폭이 허용하는 최고 화질
+    return highest_fitting(levels, clear_indices(levels), bw)
+
+
+def ra_abr(levels, bw, next_level):
+    # basic/abr-controller_RaABR.ts: NEXT-SEMANTICLEVEL을 (전체 레벨 번호 기준) 화질 상한으로 사용
+    indices = clear_indices(levels)
+    if next_level is None:
+        return highest_fitting(levels, indices, bw)
+    capped = [k for k in indices if k <= next_level]
+    for k in reversed(capped):
+        if levels[k].bandwidth <= bw:
+            return k
+    return indices[0]
+
+
+def na_abr_privacy(levels, bw, next_level):
+    # privacy/abr-controller_Na_privacy.ts: risk로 privacy/clear 그룹만 고르고 그룹 안에서 최고 화질
+    return highest_fitting(levels, group_indices(levels, next_level), bw)
+
+
+def ra_abr_privacy(levels, bw, next_level):
+    # privacy/abr-controller_Ra_privacy.ts: 그룹 선택 + NEXT-SEMANTICLEVEL을 그룹 안 번호 기준 상한으로 사용
+    indices = group_indices(levels, next_level)
+    return highest_fitting(levels, indices, bw, start=next_level)
+
+
+def first_clear(levels):
+    return clear_indices(levels)[0]
+
+
+def first_privacy(levels):
+    # privacy 컨트롤러는 MANIFEST_PARSED에서 startLevel을 첫 privacy 레벨로 지정
+    return next((k for k, level in enumerate(levels) if level.privacy), 0)
+
+
+POLICIES = {
+    # 이름: (다음 세그먼트 레벨 선택, 첫 세그먼트 레벨)
+    "NaABR":         (na_abr,         first_clear),
+    "RaABR":         (ra_abr,         first_clear),
+    "NaABR_privacy": (na_abr_privacy, first_privacy),
+    "RaABR_privacy": (ra_abr_privacy, first_privacy),
+}
+
+
+# ---------------------------------------------------------------- 시뮬레이션
+
+def playable_level(levels, k, i):
+    # LadderPolicy가 건너뛴(#EXT-X-GAP) 세그먼트면 같은 그룹에서 가장 가까운 아래 화질, 없으면 위 화질
+    if not levels[k].segments[i]["gap"]:
+        return k
+    same_group = [j for j, level in enumerate(levels) if level.privacy == levels[k].privacy]
+    for j in sorted(same_group, key=lambda j: (j > k, abs(j - k))):
+        if not levels[j].segments[i]["gap"]:
+            return j
+    raise ValueError(f"[!] Segment {i} is a gap in every variant")
+
+
+def simulate(levels, trace, policy, latency_ms=50, max_buffer_s=1.0, ewma_slow=1.0, ewma_fast=0.1,
+             default_estimate=500000):
+    choose, first_level = POLICIES[policy]
+    estimator = EwmaBandwidthEstimator(ewma_slow, ewma_fast, default_estimate)
+    latency = latency_ms / 1000
+    n_segments = min(len(level.segments) for level in levels)
+
+    t = 0.0
+    buffer = 0.0
+    startup = None
+    rebuffer_s = 0.0
+    rebuffer_events = 0
+    next_level = None
+    previous = None
+    switches = 0
+    chosen = []
+
+    for i in range(n_segments):
+        if startup is not None and buffer > max_buffer_s:
+            # hls.js는 버퍼가 maxBufferLength 아래로 내려가야 다음 세그먼트를 요청
+            t += buffer - max_buffer_s
+            buffer = max_buffer_s
+
+        if i == 0:
+            k = first_level(levels)
+        else:
+            bw = estimator.get_estimate() if estimator.can_estimate() else default_estimate
+            k = choose(levels, bw, next_level)
+        k = playable_level(levels, k, i)
+        segment = levels[k].segments[i]
+
+        end = trace.transfer_end(t + latency, segment["size"])
+        elapsed = end - t
+        if startup is not None:
+            if buffer >= elapsed:
+                buffer -= elapsed
+            else:
+                rebuffer_s += elapsed - buffer
+                rebuffer_events += 1
+                buffer = 0.0
+        t = end
+        buffer += segment["duration"]
+        if startup is None:
+            startup = t
+
+        # onFragBuffered: downloadTime = 전체 시간 - min(ttfb, 추정 ttfb)
+        estimator.sample((elapsed - min(latency, estimator.default_ttfb_ms / 1000)) * 1000, segment["size"])
+        next_level = segment["next_level"]
+
+        if previous is not None and k != previous:
+            switches += 1
+        previous = k
+        chosen.append((k, segment))
+
+    return summarize(levels, chosen, startup, rebuffer_s, rebuffer_events, switches, t + buffer)
+
+
+def summarize(levels, chosen, startup, rebuffer_s, rebuffer_events, switches, session_s):
+    by_risk = {}
+    for k, segment in chosen:
+        risk = "unknown" if segment["level"] is None else str(segment["level"])
+        entry = by_risk.setdefault(risk, {"segments": 0, "bitrate_sum": 0, "privacy": 0})
+        entry["segments"] += 1
+        entry["bitrate_sum"] += levels[k].bandwidth
+        entry["privacy"] += int(levels[k].privacy)
+
+    played_s = sum(segment["duration"] for _, segment in chosen)
+    return {
+        "segments": len(chosen),
+        "startup_s": round(startup or 0.0, 3),
+        "rebuffer_s": round(rebuffer_s, 3),
+        "rebuffer_events": rebuffer_events,
+        "rebuffer_ratio": round(rebuffer_s / played_s, 4) if played_s else 0.0,
+        "avg_bitrate_kbps": round(sum(levels[k].bandwidth for k, _ in chosen) / len(chosen) / 1000, 1)
+        if chosen else 0.0,
+        "switches": switches,
+        "session_s": round(session_s, 3),
+        "bytes": sum(segment["size"] for _, segment in chosen),
+        "by_risk": {
+            risk: {
+                "segments": entry["segments"],
+                "avg_bitrate_kbps": round(entry["bitrate_sum"] / entry["segments"] / 1000, 1),
+                "privacy_ratio": round(entry["privacy"] / entry["segments"], 3),
+            }
+            for risk, entry in sorted(by_risk.items())
+        },
+        "levels": [levels[k].name for k, _ in chosen],
+    }
+
+
+@lru_cache(maxsize=None)
+def load_trace(path, mode):
+    return BandwidthTrace.load(path, mode)
+
+
+def run_job(job):
+    # 프로세스 풀 작업 하나 (트레이스/플레이리스트는 프로세스마다 한 번만 읽음)
+    trace_path, playlist_dir, policy, options = job
+    result = simulate(load_levels(playlist_dir), load_trace(trace_path, options["trace_mode"]), policy,
+                      latency_ms=options["latency_ms"], max_buffer_s=options["max_buffer"],
+                      ewma_slow=options["ewma_slow"], ewma_fast=options["ewma_fast"],
+                      default_estimate=options["default_estimate"])
+    return dict({"trace": trace_path, "playlist": playlist_dir, "policy": policy}, **result)
+
+
+def run_sweep(traces, playlists, policies, processes=None, **options):
+    # traces × playlists × policies 전체 조합을 병렬 실행하여 결과 목록을 반환 (조합 순서 그대로)
+    for policy in policies:
+        if policy not in POLICIES:
+            raise ValueError(f"[!] Unknown ABR policy: {policy} ({', '.join(POLICIES)})")
+    jobs = [(str(trace), str(playlist), policy, options)
+            for trace, playlist, policy in itertools.product(traces, playlists, policies)]
+    if processes == 1 or len(jobs) == 1:
+        return [run_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(run_job, jobs, chunksize=max(1, len(jobs) // (4 * (processes or os.cpu_count() or 1)))))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DASS offline ABR simulator")
+    parser.add_argument("--trace", nargs="+", required=True, help="대역폭 트레이스 파일 (여러 개 가능)")
+    parser.add_argument("--playlist", nargs="+", required=True, help="master.m3u8이 있는 출력 폴더 (여러 개 가능)")
+    parser.add_argument("--policy", nargs="+", default=["RaABR", "NaABR"], choices=list(POLICIES))
+    parser.add_argument("--trace-mode", default="runtrace", choices=["runtrace", "step"])
+    parser.add_argument("--latency-ms", type=float, default=50, help="요청마다 더해지는 지연 (runTrace.js: 50ms)")
+    parser.add_argument("--max-buffer", type=float, default=1.0, help="maxBufferLength (초)")
+    parser.add_argument("--ewma-slow", type=float, default=1.0)
+    parser.add_argument("--ewma-fast", type=float, default=0.1)
+    parser.add_argument("--default-estimate", type=float, default=500000, help="abrEwmaDefaultEstimate (bps)")
+    parser.add_argument("--processes", type=int, default=None, help="병렬 프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--output", default=None, help="결과 JSON 파일 경로 (기본: stdout)")
+    parser.add_argument("--levels", action="store_true", help="세그먼트별 선택 레벨 목록도 결과에 포함")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = {
+        "trace_mode": args.trace_mode, "latency_ms": args.latency_ms, "max_buffer": args.max_buffer,
+        "ewma_slow": args.ewma_slow, "ewma_fast": args.ewma_fast, "default_estimate": args.default_estimate,
+    }
+    t = time.perf_counter()
+    results = run_sweep(args.trace, args.playlist, args.policy, processes=args.processes, **options)
+    elapsed = time.perf_counter() - t
+
+    for result in results:
+        print(f"[✔] {Path(result['trace']).name:24s} {Path(result['playlist']).name:12s} {result['policy']:14s} "
+              f"rebuffer {result['rebuffer_s']:7.3f}s ({result['rebuffer_events']:3d}) "
+              f"bitrate {result['avg_bitrate_kbps']:8.1f} kbps switches {result['switches']:4d}", file=sys.stderr)
+        if not args.levels:
+            del result["levels"]
+    print(f"[✔] Simulated {len(results)} runs in {elapsed:.3f}s", file=sys.stderr)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": dict(options, policies=args.policy, cpu_count=os.cpu_count()),
+        "elapsed_s": round(elapsed, 6),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[✔] Simulation result written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
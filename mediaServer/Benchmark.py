@@ -0,0 +1,278 @@
+# Benchmark.py
+# 합성 프레임/semantic CSV로 basic/privacy/subtitle 파이프라인의 단계별 성능을 측정
+#
+#   python Benchmark.py --variants basic privacy subtitle --frames 300 --output result.json
+#
+# 각 variant는 같은 모듈 이름(SemantEncoder 등)을 쓰므로 variant마다 별도 프로세스로 실행하고,
+# 결과는 JSON (단계별 wall time, frames/s, segments/s, bytes written, peak RSS)으로 출력
+#
+#   python Benchmark.py --profile latency                       # 인코딩 프로파일 지정
+#   python Benchmark.py --sweep-profiles --sweep-segments 5     # 앞 5개 세그먼트로 프로파일별 fps/크기/PSNR 비교
+#   python Benchmark.py --segment-mode risk --chunk 2           # risk/level 전환에 맞춘 가변 길이 세그먼트
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+MEDIA_SERVER_DIR = Path(__file__).resolve().parent
+
+VARIANTS = {
+    "basic":    ("basic",    "raPreprocessor",         "raEncoder"),
+    "privacy":  ("privacy",  "raPreprocessor_privacy", "raEncoder_privacy"),
+    "subtitle": ("subtitle", "raPreprocessor_sub",     "raEncoder_sub"),
+}
+
+
+def make_synthetic_input(input_dir, n_frames, size, fps, seed=0):
+    # ffmpeg testsrc2로 JPEG 프레임을 만들고, 평온/위험 구간이 섞인 semantic CSV 생성
+    frame_dir = input_dir / "frame"
+    frame_dir.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={fps}",
+        "-frames:v", str(n_frames), "-q:v", "3",
+        "-start_number", "1", str(frame_dir / "f_%06d.jpg")
+    ]
+    subprocess.run(cmd, check=True)
+    # privacy variant용 blur 프레임 폴더 (같은 프레임을 공유)
+    blur_dir = input_dir / "frame_blur"
+    if not blur_dir.exists():
+        blur_dir.symlink_to(frame_dir.resolve(), target_is_directory=True)
+
+    rng = np.random.default_rng(seed)
+    risk = np.zeros(n_frames, dtype=int)
+    level = np.zeros(n_frames, dtype=int)
+    start = 0
+    while start < n_frames:
+        length = int(rng.integers(fps, fps * 5))
+        if rng.random() < 0.3:
+            risk[start:start + length] = int(rng.integers(1, 3))
+            level[start:start + length] = int(rng.integers(1, 4))
+        start += length
+
+    with open(input_dir / "output.csv", "w") as f:
+        f.write("frame,risk,level\n")
+        for i in range(n_frames):
+            f.write(f"f_{i + 1:06d}.jpg,{risk[i]},{level[i]}\n")
+
+
+def dir_bytes(path, pattern="*"):
+    path = Path(path)
+    if not path.exists():
+        return 0
+    return sum(p.stat().st_size for p in path.rglob(pattern) if p.is_file() and not p.is_symlink())
+
+
+def peak_rss_kb():
+    # 현재 프로세스와 (가장 큰) ffmpeg 자식 프로세스의 최대 RSS (Linux 기준 KB)
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def stage_result(name, elapsed, n_frames, n_segments, bytes_written):
+    rss_self, rss_children = peak_rss_kb()
+    return {
+        "stage": name,
+        "wall_s": round(elapsed, 6),
+        "frames_per_s": round(n_frames / elapsed, 3) if elapsed > 0 else None,
+        "segments_per_s": round(n_segments / elapsed, 3) if elapsed > 0 else None,
+        "bytes_written": bytes_written,
+        "peak_rss_kb": rss_self,
+        "peak_child_rss_kb": rss_children,
+    }
+
+
+def run_variant(variant, work_dir, args):
+    # variant 하나의 전처리 → 인코딩 → m3u8 단계를 각각 측정 (별도 프로세스에서 실행됨)
+    sub_dir, preprocessor_module, encoder_module = VARIANTS[variant]
+    sys.path.insert(0, str(MEDIA_SERVER_DIR / sub_dir))
+    SemantPreprocessor = __import__(preprocessor_module).SemantPreprocessor
+    SemantEncoder = __import__(encoder_module).SemantEncoder
+    LadderPolicy = __import__(encoder_module).LadderPolicy
+
+    input_dir = work_dir / "input"
+    frames_dir = work_dir / variant / "frames"
+    temp_dir = work_dir / variant / "temp"
+    output_dir = work_dir / variant / "hls"
+    # "prefix,scale,bitrate" (scale 필터에 쉼표가 있어도 되도록 첫/마지막 쉼표로 분리)
+    encoding_list = [(rendition.split(",", 1)[0],) + tuple(rendition.split(",", 1)[1].rsplit(",", 1))
+                     for rendition in args.rendition]
+    privacy = variant == "privacy"
+
+    stages = []
+
+    # 1) 전처리
+    if variant == "privacy":
+        prepro = SemantPreprocessor(str(input_dir), str(frames_dir), args.fps, args.chunk, "output.csv",
+                                    frame_dir_name="frame_blur", link_mode=args.link_mode,
+                                    frame_store=args.frame_store, segment_mode=args.segment_mode,
+                                    min_chunk_duration=args.min_chunk)
+    else:
+        prepro = SemantPreprocessor(str(input_dir), str(frames_dir), args.fps, args.chunk, "output.csv",
+                                    link_mode=args.link_mode, frame_store=args.frame_store,
+                                    segment_mode=args.segment_mode, min_chunk_duration=args.min_chunk)
+    prepro.folder_init()
+    t = time.perf_counter()
+    folder_names, extra = prepro.preProcessing_all(privacy=privacy, start_frame=0, end_frame=args.frames,
+                                                   workers=args.preprocess_workers)
+    folder_names = list(folder_names)
+    stages.append(stage_result("preprocess", time.perf_counter() - t, args.frames, len(folder_names),
+                               dir_bytes(frames_dir)))
+
+    # 2) 인코딩 (세그먼트별 ffmpeg 실행, m3u8 갱신 제외)
+    encoder = SemantEncoder(str(frames_dir), str(temp_dir), str(output_dir), args.fps, encode_profile=args.profile,
+                            target_duration=args.chunk)
+    if not args.direct:
+        encoder.folder_init(encoder.output_dir_temp)
+    encoder.folder_init(encoder.output_dir)
+    # master/해상도별 m3u8도 --rendition 목록 기준으로 작성 (encoding()과 같은 playlist_info)
+    privacy_streams = (True, False) if privacy else (False,)
+    playlist_info = LadderPolicy([]).playlist_info(encoding_list, privacy_streams=privacy_streams)
+    if variant == "subtitle":
+        encoder.create_init_m3u8(playlist_info, subtitle_path=encoder.init_subtitles(extra))
+    else:
+        encoder.create_init_m3u8(playlist_info)
+
+    t = time.perf_counter()
+    if args.workers > 1:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            encoded = list(executor.map(
+                lambda folder_name: encoder.encode_segment(folder_name, encoding_list, args.single_pass, args.direct),
+                folder_names))
+    else:
+        encoded = [encoder.encode_segment(folder_name, encoding_list, args.single_pass, args.direct)
+                   for folder_name in folder_names]
+    stages.append(stage_result("encode", time.perf_counter() - t, args.frames, len(folder_names),
+                               dir_bytes(output_dir, "*.ts") + dir_bytes(temp_dir)))
+
+    # 3) m3u8 작성 (임시 결과 복사/태그 삽입 포함)
+    m3u8_bytes_before = dir_bytes(output_dir)
+    t = time.perf_counter()
+    for i, folder_name in enumerate(folder_names):
+        encoder.commit_segment(folder_name, encoded[i], encoder.next_risk_level(folder_names, i))
+    stages.append(stage_result("playlist", time.perf_counter() - t, args.frames, len(folder_names),
+                               dir_bytes(output_dir) - m3u8_bytes_before))
+
+    result = {
+        "variant": variant,
+        "frames": args.frames,
+        "segments": len(folder_names),
+        "renditions": len(encoding_list),
+        "stages": stages,
+        "total_wall_s": round(sum(stage["wall_s"] for stage in stages), 6),
+    }
+
+    # 4) (선택) 앞 sweep_segments개 세그먼트로 인코딩 프로파일 비교
+    if args.sweep_profiles is not None:
+        result["profile_sweep"] = encoder.profile_sweep(folder_names[:args.sweep_segments], encoding_list,
+                                                        profiles=args.sweep_profiles or None,
+                                                        single_pass=args.single_pass)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DASS media server pipeline benchmark")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", default="640x360")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--chunk", type=int, default=1, help="max_chunk_duration (초)")
+    parser.add_argument("--segment-mode", default="fixed", choices=["fixed", "risk"],
+                        help="세그먼트 경계 (fixed: chunk 단위, risk: risk/level 전환 프레임)")
+    parser.add_argument("--min-chunk", type=float, default=0.5, help="segment-mode risk의 최소 세그먼트 길이 (초)")
+    parser.add_argument("--rendition", action="append",
+                        help="prefix,scale,bitrate (여러 번 지정 가능). 기본: 360p/144p")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--preprocess-workers", type=int, default=1, help="세그먼트 프레임 배치 스레드 수")
+    parser.add_argument("--single-pass", action="store_true")
+    parser.add_argument("--direct", action="store_true")
+    parser.add_argument("--link-mode", default="copy", choices=["copy", "hardlink", "symlink"])
+    parser.add_argument("--frame-store", action="store_true",
+                        help="프레임 파일 대신 FrameStore(input/frame.store)에서 읽음")
+    parser.add_argument("--profile", default="default", help="인코딩 프로파일 (default, latency, throughput, quality)")
+    parser.add_argument("--sweep-profiles", nargs="*", default=None,
+                        help="프로파일별 fps/크기/PSNR 비교 (이름을 생략하면 모든 프로파일)")
+    parser.add_argument("--sweep-segments", type=int, default=5, help="프로파일 비교에 쓸 세그먼트 수")
+    parser.add_argument("--work-dir", default=None, help="지정하면 입력/출력을 지우지 않고 남김")
+    parser.add_argument("--output", default=None, help="결과 JSON 파일 경로 (기본: stdout)")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if not args.rendition:
+        args.rendition = ["360p,scale=640:360,800k", "144p,scale=256:144,250k"]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.worker is not None:
+        # 자식 프로세스: variant 하나 실행 후 결과를 마지막 줄에 JSON으로 출력
+        result = run_variant(args.worker, Path(args.work_dir), args)
+        sys.stdout.flush()
+        print("BENCHMARK_RESULT " + json.dumps(result))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="dass_bench_") as temp_root:
+        work_dir = Path(args.work_dir) if args.work_dir else Path(temp_root)
+        work_dir.mkdir(parents=True, exist_ok=True)
+
+        print(f"[▶] Generating {args.frames} synthetic frames ({args.size}) in {work_dir}", file=sys.stderr)
+        t = time.perf_counter()
+        make_synthetic_input(work_dir / "input", args.frames, args.size, args.fps)
+        if args.frame_store:
+            sys.path.insert(0, str(MEDIA_SERVER_DIR / "basic"))
+            FrameStore = __import__("raPreprocessor").FrameStore
+            for frame_dir_name in ("frame", "frame_blur"):
+                FrameStore.pack(work_dir / "input" / frame_dir_name)
+        generate_s = time.perf_counter() - t
+
+        results = []
+        passthrough = list(argv if argv is not None else sys.argv[1:])
+        for variant in args.variants:
+            print(f"[▶] Running benchmark: {variant}", file=sys.stderr)
+            cmd = [sys.executable, str(Path(__file__).resolve())] + passthrough + \
+                  ["--worker", variant, "--work-dir", str(work_dir)]
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            lines = [line for line in proc.stdout.splitlines() if line.startswith("BENCHMARK_RESULT ")]
+            if proc.returncode != 0 or not lines:
+                print("\n".join(proc.stderr.splitlines()[-20:]), file=sys.stderr)
+                raise RuntimeError(f"[!] Benchmark failed for variant {variant} (exit code {proc.returncode})")
+            result = json.loads(lines[-1][len("BENCHMARK_RESULT "):])
+            results.append(result)
+            for stage in result["stages"]:
+                print(f"[✔] {variant:8s} {stage['stage']:10s} {stage['wall_s']:8.3f}s "
+                      f"{stage['frames_per_s'] or 0:9.1f} fps {stage['bytes_written']:>12d} B", file=sys.stderr)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "frames": args.frames, "size": args.size, "fps": args.fps, "chunk": args.chunk,
+            "segment_mode": args.segment_mode, "min_chunk": args.min_chunk,
+            "renditions": args.rendition, "workers": args.workers,
+            "preprocess_workers": args.preprocess_workers, "single_pass": args.single_pass,
+            "direct": args.direct, "link_mode": args.link_mode, "frame_store": args.frame_store,
+            "profile": args.profile,
+            "cpu_count": os.cpu_count(),
+        },
+        "generate_s": round(generate_s, 6),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[✔] Benchmark result written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
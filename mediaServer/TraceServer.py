@@ -0,0 +1,253 @@
+# TraceServer.py
+# SemantEncoder의 output_dir(HLS)을 대역폭 트레이스에 맞춰 제한된 속도로 서빙하는 asyncio HTTP origin
+# (runTrace.js + Windows Chrome DevTools 네트워크 에뮬레이션 없이 아무 HLS 클라이언트로 재생 실험)
+#
+#   python TraceServer.py ./output/hls --trace ../surveillanceServer/trace/semantic_trace.txt --port 8080 \
+#                         --log requests.jsonl
+#   → http://127.0.0.1:8080/master.m3u8
+#
+# - 연결마다 토큰 버킷으로 전송 속도를 제한하고, 버킷 충전 속도는 트레이스 시각의 대역폭을 따름
+#   (--scope global 이면 모든 연결이 버킷 하나를 공유 → 브라우저 한 탭 전체를 제한하던 CDP와 같은 조건)
+# - 트레이스 시계는 첫 요청에서 시작하며, 트레이스가 끝나면 마지막 대역폭을 유지
+# - 요청마다 latency(기본 50ms, runTrace.js와 동일)를 더한 뒤 응답
+# - nginx.conf의 /hls location과 같은 MIME/CORS/no-cache 헤더
+# - 요청마다 시작 시각, TTFB, 전송 시간, 평균 처리량, 트레이스 대역폭을 stderr(와 --log JSONL)에 기록
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from AbrSimulator import BandwidthTrace
+
+
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+    ".vtt": "text/vtt",
+    ".json": "application/json",
+    ".html": "text/html; charset=utf-8",
+    ".js": "application/javascript",
+}
+
+COMMON_HEADERS = [
+    ("Access-Control-Allow-Origin", "*"),
+    ("Access-Control-Allow-Methods", "GET, HEAD, OPTIONS"),
+    ("Access-Control-Allow-Headers", "DNT,User-Agent,X-Requested-With,If-Modified-Since,Cache-Control,Content-Type,Range"),
+    ("Access-Control-Expose-Headers", "Content-Length,Content-Range"),
+    ("Cache-Control", "no-store, no-cache, must-revalidate, max-age=0"),
+    ("Pragma", "no-cache"),
+    ("Expires", "0"),
+]
+
+REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed"}
+
+
+class TraceClock ():
+    # 트레이스 시각 (초). 첫 요청에서 0으로 시작
+    def __init__ (self, trace):
+        self.trace = trace
+        self.origin = None
+
+    def now(self):
+        loop_time = asyncio.get_running_loop().time()
+        if self.origin is None:
+            self.origin = loop_time
+        return loop_time - self.origin
+
+
+class TokenBucket ():
+    # 트레이스 대역폭으로 충전되는 토큰 버킷 (토큰 1개 = 1 byte, 최대 burst bytes까지 쌓임)
+    def __init__ (self, clock, burst):
+        self.clock = clock
+        self.burst = burst
+        self.tokens = 0.0
+        self.updated = None
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock.now()
+        if self.updated is None:
+            self.updated = now
+        self.tokens = min(self.burst, self.tokens + self.clock.trace.transferred(self.updated, now))
+        self.updated = now
+        return now
+
+    async def consume(self, n_bytes):
+        # n_bytes를 보낼 수 있을 때까지 대기 (global 버킷은 연결들이 lock 순서대로 번갈아 사용)
+        async with self.lock:
+            now = self._refill()
+            if self.tokens < n_bytes:
+                await asyncio.sleep(self.clock.trace.transfer_end(now, n_bytes - self.tokens) - now)
+                self._refill()
+            self.tokens -= n_bytes
+
+
+class TraceServer ():
+    def __init__ (self, root, trace, latency_ms=50, chunk_size=16384, scope="connection", log_path=None):
+        self.root = Path(root).resolve()
+        if not self.root.is_dir():
+            raise ValueError(f"[!] HLS directory not found: {root}")
+        self.clock = TraceClock(trace)
+        self.latency = latency_ms / 1000
+        self.chunk_size = chunk_size
+        self.scope = scope
+        self.shared_bucket = TokenBucket(self.clock, chunk_size) if scope == "global" else None
+        self.log_file = open(log_path, "a") if log_path else None
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def resolve(self, target):
+        # URL 경로 → root 아래 파일 (root 밖으로 나가는 경로는 None)
+        path = (self.root / unquote(urlsplit(target).path).lstrip("/")).resolve()
+        if path != self.root and self.root not in path.parents:
+            return None
+        return path
+
+    async def handle(self, reader, writer):
+        bucket = self.shared_bucket or TokenBucket(self.clock, self.chunk_size)
+        peer = writer.get_extra_info("peername")
+        client = f"{peer[0]}:{peer[1]}" if peer else "-"
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                keep_alive = await self.respond(request_line.decode("latin-1").split(), headers, bucket, writer, client)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, request, headers, bucket, writer, client):
+        start = self.clock.now()
+        trace_kbps = self.clock.trace.bandwidth_at(start)
+        if len(request) != 3:
+            await self.send_head(writer, 400, 0, False)
+            return False
+        method, target, version = request
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+        await asyncio.sleep(self.latency)
+
+        path = self.resolve(target)
+        if method == "OPTIONS":
+            status, body_path = 204, None
+        elif method not in ("GET", "HEAD"):
+            status, body_path = 405, None
+        elif path is None:
+            status, body_path = 403, None
+        elif not path.is_file():
+            status, body_path = 404, None
+        else:
+            status, body_path = 200, path
+
+        size = body_path.stat().st_size if body_path else 0
+        content_type = CONTENT_TYPES.get(body_path.suffix, "application/octet-stream") if body_path else None
+        await self.send_head(writer, status, size, keep_alive, content_type)
+        ttfb = self.clock.now() - start
+
+        sent = 0
+        if body_path and method == "GET":
+            with open(body_path, "rb") as f:
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    await bucket.consume(len(chunk))
+                    writer.write(chunk)
+                    await writer.drain()
+                    sent += len(chunk)
+
+        elapsed = self.clock.now() - start
+        self.requests += 1
+        self.bytes_sent += sent
+        self.log({
+            "client": client, "method": method, "path": target, "status": status, "bytes": sent,
+            "trace_t": round(start, 3), "trace_kbps": trace_kbps, "ttfb_ms": round(ttfb * 1000, 1),
+            "duration_ms": round(elapsed * 1000, 1),
+            "throughput_kbps": round(sent * 8 / (elapsed - ttfb) / 1000, 1) if sent and elapsed > ttfb else None,
+        })
+        return keep_alive
+
+    async def send_head(self, writer, status, size, keep_alive, content_type=None):
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}"]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        lines.append(f"Content-Length: {size}")
+        lines += [f"{key}: {value}" for key, value in COMMON_HEADERS]
+        lines.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    def log(self, entry):
+        print(f"[✔] t={entry['trace_t']:8.3f}s {entry['status']} {entry['path']:28s} {entry['bytes']:9d} B "
+              f"ttfb {entry['ttfb_ms']:7.1f} ms total {entry['duration_ms']:8.1f} ms "
+              f"(trace {entry['trace_kbps']:.0f} kbps)", file=sys.stderr)
+        if self.log_file:
+            self.log_file.write(json.dumps(dict(entry, timestamp=time.time())) + "\n")
+            self.log_file.flush()
+
+    async def serve(self, host="127.0.0.1", port=8080, duration=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"[▶] Serving {self.root} at http://{host}:{port}/ "
+              f"(trace {self.clock.trace.name}, scope {self.scope}, latency {self.latency * 1000:.0f} ms)",
+              file=sys.stderr)
+        async with server:
+            if duration:
+                await asyncio.sleep(duration)
+            else:
+                await server.serve_forever()
+        self.close()
+
+    def close(self):
+        print(f"[✔] Served {self.requests} requests, {self.bytes_sent} bytes", file=sys.stderr)
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DASS bandwidth-shaping HLS origin")
+    parser.add_argument("root", help="서빙할 HLS 폴더 (SemantEncoder output_dir)")
+    parser.add_argument("--trace", required=True, help="대역폭 트레이스 파일 (semantic_trace.txt 형식)")
+    parser.add_argument("--trace-mode", default="runtrace", choices=["runtrace", "step"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=50, help="요청마다 더해지는 지연 (runTrace.js: 50ms)")
+    parser.add_argument("--scope", default="connection", choices=["connection", "global"],
+                        help="토큰 버킷 단위 (연결마다 / 서버 전체 공유)")
+    parser.add_argument("--chunk-size", type=int, default=16384, help="전송 단위이자 버킷 최대 burst (bytes)")
+    parser.add_argument("--duration", type=float, default=None, help="지정한 시간(초) 후 종료 (기본: 계속 실행)")
+    parser.add_argument("--log", default=None, help="요청별 기록 JSONL 파일 경로")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = TraceServer(args.root, BandwidthTrace.load(args.trace, args.trace_mode), latency_ms=args.latency_ms,
+                         chunk_size=args.chunk_size, scope=args.scope, log_path=args.log)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.duration))
+    except KeyboardInterrupt:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 # Testing.py
 
 from raPreprocessor import SemantPreprocessor
-from raEncoder import SemantEncoder
+from raEncoder import SemantEncoder, LadderPolicy
 from semanticEncoder import semanticEncoder
 import numpy as np
 
@@ -18,6 +18,8 @@ END_FRAME = 7020
 preprocTest = False
 encoderTest = False
 s_encoderTest = True # <-- 전체 파이프라인 실행
+ladderManifestTest = False # LadderPolicy skip(#EXT-X-GAP) + encode manifest/resume 회귀 테스트
+persistentRiskTest = False # segment_mode="risk" + encoding_persistent 세그먼트별 프레임 수 회귀 테스트
 # ------------------------------------------------
 
 ## 옵션 1: 전처리(Preprocessing)만 테스트
@@ -79,4 +81,93 @@ if s_encoderTest:
     # 상단에 설정된 START_FRAME과 END_FRAME 변수를 사용
     s_encoder.encoding_all(enable_pre=True, start_frame=START_FRAME, end_frame=END_FRAME)
     
-    print("[✔] Full Semantic Encoder Pipeline Finished.")
\ No newline at end of file
+    print("[✔] Full Semantic Encoder Pipeline Finished.")
+
+
+## 옵션 4: LadderPolicy로 건너뛴 해상도(#EXT-X-GAP)가 있을 때 manifest 기록과 resume 확인
+if ladderManifestTest:
+    print("[▶] Running Ladder Skip + Encode Manifest Test...")
+    # --- 설정 ---
+    input_dir_pre = "./input"
+    output_dir_pre = "./output/frames"
+    output_dir_temp = "./output/temp"
+    output_dir_main = "./output/hls_ladder"
+    fps = 30
+    max_chunk_duration = 1
+    encoding_list = [("360p", "scale=640:360", "800k"), ("144p", "scale=256:144", "250k")]
+    # level 1 이하 세그먼트는 360p를 건너뜀 → 360p.m3u8에 GAP 항목
+    ladder_policy = LadderPolicy([{"max_level": 1, "skip": ["360p"]}])
+
+    prepro = SemantPreprocessor(input_dir_pre, output_dir_pre, fps, max_chunk_duration, "output.csv")
+    prepro.folder_init()
+    folder_names, _ = prepro.preProcessing_all(start_frame=START_FRAME, end_frame=END_FRAME)
+
+    for direct in (False, True):
+        encoder = SemantEncoder(output_dir_pre, output_dir_temp, output_dir_main, fps, ladder_policy=ladder_policy)
+        encoder.encoding(list(folder_names), encoding_list=encoding_list, direct=direct)
+        with open(output_dir_main + "/360p.m3u8") as f:
+            playlist = f.read()
+        print(f"[i] direct={direct}: {playlist.count('#EXT-X-GAP')} GAP entries in 360p.m3u8")
+
+        # 같은 입력으로 resume → 기록된 세그먼트를 모두 복원하고 다시 인코딩하지 않아야 함
+        encoder = SemantEncoder(output_dir_pre, output_dir_temp, output_dir_main, fps, ladder_policy=ladder_policy)
+        encoder.encoding(list(folder_names), encoding_list=encoding_list, direct=direct, resume=True)
+        with open(output_dir_main + "/360p.m3u8") as f:
+            resumed = f.read()
+        if resumed != playlist:
+            raise ValueError(f"[!] Resumed playlist differs from the original (direct={direct})")
+
+    print("[✔] Ladder Skip + Encode Manifest Test Finished.")
+
+
+## 옵션 5: risk 경계(프레임 단위)로 자른 세그먼트를 PersistentSegmenter로 인코딩했을 때 .ts별 프레임 수 확인
+if persistentRiskTest:
+    print("[▶] Running Risk Segment + Persistent Encoder Frame Count Test...")
+    # --- 설정 ---
+    input_dir_pre = "./input"
+    output_dir_pre = "./output/frames"
+    output_dir_temp = "./output/temp"
+    output_dir_main = "./output/hls_persistent"
+    fps = 30
+    max_chunk_duration = 2
+    encoding_list = [("144p", "scale=256:144", "250k")]
+
+    def count_ts_frames(ts_path):
+        # 비디오 PES 시작 패킷 수 = 프레임 수 (ffmpeg mpegts muxer는 프레임마다 PES 하나)
+        with open(ts_path, "rb") as f:
+            data = f.read()
+        n_frames = 0
+        for i in range(0, len(data), 188):
+            packet = data[i:i + 188]
+            if packet[1] & 0x40:
+                offset = 4 + (1 + packet[4] if packet[3] & 0x20 else 0)
+                n_frames += packet[offset:offset + 4] == b"\x00\x00\x01\xe0"
+        return n_frames
+
+    prepro = SemantPreprocessor(input_dir_pre, output_dir_pre, fps, max_chunk_duration, "output.csv",
+                                segment_mode="risk")
+
+    # 강제(max_images) 경계 직후 min_images 안의 전환도 경계로 남아야 함
+    # (0~131 risk 2/level 1, 132~165 risk 1/level 3, 166~239 risk 0/level 0 → level 3 구간이 앞 세그먼트에 묻히지 않음)
+    risk = np.array([2] * 132 + [1] * 34 + [0] * 74)
+    level = np.array([1] * 132 + [3] * 34 + [0] * 74)
+    starts, ends = prepro.segment_bounds(risk, level)
+    seg_risk, seg_level = prepro.segment_labels(risk, level, (starts, ends))
+    for start, end in zip(starts, ends):
+        if len(set(zip(risk[start:end], level[start:end]))) != 1:
+            raise ValueError(f"[!] Segment {start}~{end} mixes risk/level labels")
+    if 3 not in seg_level:
+        raise ValueError(f"[!] Level 3 run lost in risk segmentation: {list(zip(starts, ends))}")
+
+    segments = prepro.plan_segments(start_frame=START_FRAME, end_frame=END_FRAME)
+    encoder = SemantEncoder(output_dir_pre, output_dir_temp, output_dir_main, fps)
+    encoder.encoding_persistent(segments, encoding_list=encoding_list)
+
+    # 경계 프레임이 fps로 나누어떨어지지 않아도 (예: 50/30초) 키프레임과 분할이 한 프레임 밀리지 않아야 함
+    for folder_name, paths in segments:
+        ts_path = f"{output_dir_main}/144p_{folder_name.split('_')[-4]}.ts"
+        n_frames = count_ts_frames(ts_path)
+        if n_frames != len(paths):
+            raise ValueError(f"[!] {ts_path} has {n_frames} frames, expected {len(paths)}")
+
+    print("[✔] Risk Segment + Persistent Encoder Frame Count Test Finished.")
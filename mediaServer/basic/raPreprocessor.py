@@ -1,94 +1,480 @@
 # raPreprocessor.py
 
 import pandas as pd
+import csv
+import json
+import mmap
 import os
+import time
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import numpy as np
 
+class FrameStore ():
+    # 프레임을 파일 하나씩 두지 않고 <프레임 폴더>.store/ 안에 이어 붙여 보관하는 append-only 저장소
+    #   frames.bin : 인코딩된 프레임(JPEG) 바이트를 순서대로 이어 붙인 파일 (mmap으로 읽음)
+    #   index.bin  : 프레임마다 (offset, length, 도착 시각) 고정 길이 레코드 → 번호로 O(1) 접근
+    #   names.txt  : 프레임 이름 (semantic CSV의 frame 열), 한 줄에 하나
+    # append는 frames.bin → names.txt → index.bin 순서로 쓰므로 index 레코드가 있는 프레임만 완성된 프레임이고,
+    # 쓰는 도중 중단되어 남은 꼬리는 다음 append 전에 잘라냄 (쓰는 프로세스는 하나라고 가정)
+    INDEX_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u8"), ("time", "<f8")])
+
+    def __init__ (self, store_dir):
+        self.store_dir = Path(store_dir)
+        self.data_path = self.store_dir / "frames.bin"
+        self.index_path = self.store_dir / "index.bin"
+        self.names_path = self.store_dir / "names.txt"
+        self.index = np.zeros(0, dtype=self.INDEX_DTYPE)
+        self.names = {}  # 이름 → 프레임 번호
+        self._names_offset = 0
+        self._data = None
+        self._writer = None
+        self.refresh()
+
+    def __len__ (self):
+        return len(self.index)
+
+    def refresh(self):
+        # 다른 프로세스(캡처 단계)가 이어 쓴 프레임까지 index/이름/mmap을 다시 읽음
+        if not self.index_path.exists():
+            return len(self.index)
+        n_frames = self.index_path.stat().st_size // self.INDEX_DTYPE.itemsize
+        if n_frames != len(self.index):
+            self.index = np.memmap(self.index_path, dtype=self.INDEX_DTYPE, mode="r", shape=(n_frames,)) \
+                if n_frames > 0 else np.zeros(0, dtype=self.INDEX_DTYPE)
+
+        with open(self.names_path, "rb") as f:
+            f.seek(self._names_offset)
+            data = f.read()
+        end = data.rfind(b"\n")
+        if end >= 0:
+            self._names_offset += end + 1
+            for name in data[:end].decode("utf-8").split("\n"):
+                self.names[name] = len(self.names)
+
+        needed = int(self.index[-1]["offset"] + self.index[-1]["length"]) if n_frames > 0 else 0
+        if needed > 0 and (self._data is None or len(self._data) < needed):
+            # 이전 mmap은 아직 쓰이는 memoryview가 있을 수 있으므로 닫지 않고 참조만 교체
+            with open(self.data_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return len(self.index)
+
+    def index_of(self, name):
+        # 완성된 프레임이면 번호, 아니면 None
+        i = self.names.get(name)
+        return i if i is not None and i < len(self.index) else None
+
+    def frame(self, i):
+        # i번째 프레임 바이트 (복사 없이 mmap을 가리키는 memoryview)
+        record = self.index[i]
+        offset = int(record["offset"])
+        return memoryview(self._data)[offset:offset + int(record["length"])]
+
+    def read(self, names):
+        # 이름 목록 → 프레임 memoryview 목록 (없는 프레임이 있으면 index를 한 번 다시 읽고 그래도 없으면 에러)
+        indices = [self.index_of(name) for name in names]
+        if None in indices:
+            self.refresh()
+            indices = [self.index_of(name) for name in names]
+        missing = [name for name, i in zip(names, indices) if i is None]
+        if missing:
+            raise ValueError(f"[!] {len(missing)} frames are not in {self.store_dir} (first: {missing[0]})")
+        return [self.frame(i) for i in indices]
+
+    def arrival_time(self, name):
+        return float(self.index[self.names[name]]["time"])
+
+    def append(self, name, data, arrival_time=None):
+        if self._writer is None:
+            self._open_writer()
+        data_file, names_file, index_file = self._writer
+        offset = data_file.tell()
+        data_file.write(data)
+        data_file.flush()
+        names_file.write(name.encode("utf-8") + b"\n")
+        names_file.flush()
+        record = np.array([(offset, len(data), time.time() if arrival_time is None else arrival_time)],
+                          dtype=self.INDEX_DTYPE)
+        index_file.write(record.tobytes())
+        index_file.flush()
+
+    def _open_writer(self):
+        # 마지막 index 레코드 뒤에 남은 (중단된 append의) 바이트/이름을 잘라내고 이어 쓰기 시작
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        for path in (self.data_path, self.index_path, self.names_path):
+            path.touch()
+        n_frames = self.index_path.stat().st_size // self.INDEX_DTYPE.itemsize
+        os.truncate(self.index_path, n_frames * self.INDEX_DTYPE.itemsize)
+        self.refresh()
+        data_end = int(self.index[-1]["offset"] + self.index[-1]["length"]) if n_frames > 0 else 0
+        os.truncate(self.data_path, data_end)
+        with open(self.names_path, "rb") as f:
+            lines = f.read().split(b"\n")[:n_frames]
+        with open(self.names_path, "wb") as f:
+            f.write(b"".join(line + b"\n" for line in lines))
+        self.names = {name: i for name, i in self.names.items() if i < n_frames}
+        self._names_offset = self.names_path.stat().st_size
+        self._writer = tuple(open(path, "ab") for path in (self.data_path, self.names_path, self.index_path))
+
+    def close(self):
+        if self._writer is not None:
+            for f in self._writer:
+                f.close()
+            self._writer = None
+
+    @classmethod
+    def pack(cls, frame_dir, store_dir=None):
+        # 기존 프레임 폴더(프레임마다 파일 하나)를 저장소로 변환 (이름 순서, 이미 들어 있는 프레임은 건너뜀)
+        frame_dir = Path(frame_dir)
+        store = cls(store_dir if store_dir is not None else frame_dir.parent / f"{frame_dir.name}.store")
+        n_packed = 0
+        for path in sorted(frame_dir.iterdir()):
+            if path.is_file() and store.index_of(path.name) is None:
+                store.append(path.name, path.read_bytes(), path.stat().st_mtime)
+                n_packed += 1
+        store.close()
+        store.refresh()
+        print(f"[✔] Packed {n_packed} frames from {frame_dir} into {store.store_dir} ({len(store)} frames)")
+        return store
+
+
 class SemantPreprocessor ():
-    def __init__ (self, input_dir_pre, output_dir_pre, fps, max_chunk_duration, semantic_fname):
+    def __init__ (self, input_dir_pre, output_dir_pre, fps, max_chunk_duration, semantic_fname, link_mode="copy",
+                  label_mode="first", semantic_cache=False, frame_store=False, segment_mode="fixed",
+                  min_chunk_duration=0.5):
         self.input_dir = Path(input_dir_pre)
         self.output_dir = Path(output_dir_pre)
         self.fps = fps
         self.max_duration = max_chunk_duration  
         self.max_images = fps * max_chunk_duration
+        if segment_mode not in ("fixed", "risk"):
+            raise ValueError(f"[!] segment_mode must be one of fixed/risk. got={segment_mode}")
+        # fixed: max_images 프레임마다 자름 (마지막 불완전 청크는 버림)
+        # risk: risk/level이 바뀌는 프레임에서 자르되 min_images~max_images 길이로 제한 (마지막 청크 유지)
+        self.segment_mode = segment_mode
+        self.min_images = max(1, min(int(round(fps * min_chunk_duration)), self.max_images))
         self.semantic_fname = semantic_fname
+        if link_mode not in ("copy", "hardlink", "symlink"):
+            raise ValueError(f"[!] link_mode must be one of copy/hardlink/symlink. got={link_mode}")
+        self.link_mode = link_mode
+        if label_mode not in ("first", "max"):
+            raise ValueError(f"[!] label_mode must be one of first/max. got={label_mode}")
+        self.label_mode = label_mode  # first: 첫 프레임 라벨, max: 세그먼트 내 최고 level과 그 프레임의 risk
+        self.semantic_cache = semantic_cache  # True: 파싱한 CSV를 .npy 열로 저장해 두고 mmap으로 재사용
+        # True: input/<프레임 폴더>/ 의 프레임 파일 대신 input/<프레임 폴더>.store/ (FrameStore)에서 프레임을 읽음
+        self.frame_store = frame_store
+        self._frame_stores = {}
+        # 라이브 모드에서 증가하는 CSV를 이어 읽기 위한 상태
+        self._live_offset = 0
+        self._live_columns = None
         
     def folder_init (self):
         if self.output_dir.exists():
             print ("Remove folders in output_dir of preprocessing", self.output_dir)
             shutil.rmtree(self.output_dir)
     
-    def load_semantic_info (self, semantic_fname = None, start_frame=0, end_frame=None):
-        # [수정] end_frame 파라미터 추가
+    def load_semantic_table(self, semantic_fname=None, start_frame=0, end_frame=None):
+        # CSV 전체를 올리지 않고 start_frame~end_frame 행의 frame/risk/level 열만 NumPy 배열로 읽음
         if semantic_fname is None:
             semantic_fname = self.semantic_fname
-        
         semantic_path = self.input_dir / semantic_fname
-        semantic_df = pd.read_csv(semantic_path)
-
-        # [수정] start_frame과 end_frame을 사용하여 DataFrame을 슬라이싱
-        if end_frame is None:
-            end_frame = len(semantic_df) # end_frame이 없으면 끝까지 처리
-            
-        if start_frame > 0 or end_frame < len(semantic_df):
-            print(f"[✔] Processing frames from index {start_frame} to {end_frame}")
-            semantic_df = semantic_df.iloc[start_frame:end_frame]
-        
-        frame_risk_list = list(zip(semantic_df["frame"], semantic_df["risk"], semantic_df["level"]))
+
+        if self.semantic_cache:
+            frames, risk, level = self.load_semantic_cache(semantic_path)
+            stop = len(risk) if end_frame is None else min(end_frame, len(risk))
+            frames, risk, level = frames[start_frame:stop], risk[start_frame:stop], level[start_frame:stop]
+        else:
+            nrows = None if end_frame is None else max(0, end_frame - start_frame)
+            semantic_df = pd.read_csv(semantic_path, usecols=["frame", "risk", "level"], dtype={"frame": str},
+                                      skiprows=range(1, start_frame + 1), nrows=nrows)
+            frames = semantic_df["frame"].to_numpy(dtype=str)
+            risk = semantic_df["risk"].to_numpy()
+            level = semantic_df["level"].to_numpy()
+
+        if start_frame > 0 or end_frame is not None:
+            print(f"[✔] Processing frames from index {start_frame} to {start_frame + len(frames)}")
+        return frames, risk, level
+
+    def load_semantic_cache(self, semantic_path):
+        # <csv 이름>_cache/ 에 frame/risk/level 열을 .npy로 저장하고 mmap으로 읽음
+        # (CSV 크기나 수정 시각이 바뀌면 다시 생성)
+        cache_dir = semantic_path.parent / f"{semantic_path.stem}_cache"
+        meta_path = cache_dir / "meta.json"
+        stat = semantic_path.stat()
+        signature = [stat.st_size, stat.st_mtime_ns]
+
+        if not meta_path.exists() or json.loads(meta_path.read_text()) != signature:
+            print(f"[i] Building semantic cache at {cache_dir}")
+            frames, risk, level = [], [], []
+            for chunk in pd.read_csv(semantic_path, usecols=["frame", "risk", "level"], dtype={"frame": str},
+                                     chunksize=1000000):
+                frames.append(chunk["frame"].to_numpy(dtype=str))
+                risk.append(chunk["risk"].to_numpy())
+                level.append(chunk["level"].to_numpy())
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            np.save(cache_dir / "frame.npy", np.concatenate(frames))
+            np.save(cache_dir / "risk.npy", np.concatenate(risk))
+            np.save(cache_dir / "level.npy", np.concatenate(level))
+            meta_path.write_text(json.dumps(signature))
+
+        return tuple(np.load(cache_dir / f"{name}.npy", mmap_mode="r") for name in ("frame", "risk", "level"))
+
+    def load_semantic_info(self, semantic_fname=None, start_frame=0, end_frame=None):
+        frames, risk, level = self.load_semantic_table(semantic_fname, start_frame=start_frame, end_frame=end_frame)
+        frame_risk_list = list(zip(frames, risk, level))
         return frame_risk_list
-    
-    def splitSegemnt(self, filename, risk, level, folder_index, file_index, new_folder = False, privacy = False):
+
+    def segment_bounds(self, risk, level):
+        # 세그먼트별 (시작, 끝) 프레임 번호 배열 (끝은 포함하지 않음)
+        n_frames = len(risk)
+        if self.segment_mode == "fixed":
+            starts = np.arange(n_frames // self.max_images) * self.max_images
+            return starts, starts + self.max_images
+        if n_frames == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+        # risk 모드: (risk, level)이 바뀌는 프레임은 항상 경계 (min_images보다 짧은 구간만 다음 구간에 합침)
+        # 전환 사이 구간이 max_images보다 길면 max_images마다 강제로 자르되, 마지막 조각이 min_images보다 짧아지면
+        # 그 앞의 강제 경계를 당겨 다음 전환이 그대로 경계가 되도록 함 (강제 경계가 전환을 밀어내지 않음)
+        risk, level = np.asarray(risk), np.asarray(level)
+        transitions = np.flatnonzero((risk[1:] != risk[:-1]) | (level[1:] != level[:-1])) + 1
+        cuts = [0]
+        for t in transitions:
+            if t - cuts[-1] >= self.min_images:
+                cuts.append(int(t))
+        cuts.append(n_frames)
+        starts = []
+        for start, end in zip(cuts[:-1], cuts[1:]):
+            forced = list(range(start, end, self.max_images))
+            if len(forced) > 1 and end - forced[-1] < self.min_images:
+                forced[-1] = max(end - self.min_images, forced[-2] + self.min_images)
+            starts += forced
+        starts = np.array(starts, dtype=int)
+        return starts, np.append(starts[1:], n_frames)
+
+    def segment_labels(self, risk, level, bounds=None):
+        # 세그먼트별 (risk, level) 라벨 계산 (fixed 모드는 max_images 단위로 reshape해 NumPy로 한 번에)
+        if self.segment_mode != "fixed":
+            starts, ends = bounds if bounds is not None else self.segment_bounds(risk, level)
+            risk, level = np.asarray(risk), np.asarray(level)
+            if self.label_mode == "max":
+                peak = np.array([start + int(level[start:end].argmax()) for start, end in zip(starts, ends)], dtype=int)
+            else:
+                peak = starts
+            return risk[peak], level[peak]
+
+        n_chunks = len(risk) // self.max_images
+        risk = np.asarray(risk[:n_chunks * self.max_images]).reshape(n_chunks, self.max_images)
+        level = np.asarray(level[:n_chunks * self.max_images]).reshape(n_chunks, self.max_images)
+        if self.label_mode == "max":
+            peak = level.argmax(axis=1)
+            rows = np.arange(n_chunks)
+            return risk[rows, peak], level[rows, peak]
+        return risk[:, 0], level[:, 0]
+
+    def get_frame_store(self, frame_dir_name=None):
+        frame_dir_name = frame_dir_name or "frame"
+        if frame_dir_name not in self._frame_stores:
+            store_dir = self.input_dir / f"{frame_dir_name}.store"
+            if not store_dir.exists():
+                raise ValueError(f"[!] Frame store not found: {store_dir} (FrameStore.pack으로 프레임 폴더를 변환)")
+            self._frame_stores[frame_dir_name] = FrameStore(store_dir)
+        return self._frame_stores[frame_dir_name]
+
+    def materialize_frame(self, src_path, dst_path):
+        # 프레임 바이트를 복사하지 않고 hardlink/symlink로 세그먼트 폴더에 배치,
+        # 파일시스템이 지원하지 않으면 (다른 디바이스, 권한 등) 이후 프레임은 복사로 전환
+        if dst_path.is_symlink() or dst_path.exists():
+            dst_path.unlink()  # 이전 실행의 링크를 통해 원본 프레임을 덮어쓰지 않도록 제거
+        if self.link_mode in ("hardlink", "symlink"):
+            try:
+                if self.link_mode == "hardlink":
+                    os.link(src_path, dst_path)
+                else:
+                    os.symlink(os.path.abspath(src_path), dst_path)
+                return
+            except OSError as e:
+                print(f"[!] {self.link_mode} failed ({e}), falling back to copy")
+                self.link_mode = "copy"
+        shutil.copyfile(src_path, dst_path)
+
+    def write_store_frame(self, frame, dst_path):
+        # 저장소 프레임(memoryview)을 세그먼트 폴더의 파일로 기록 (폴더 기반 인코딩 경로용)
+        if dst_path.is_symlink() or dst_path.exists():
+            dst_path.unlink()
+        with open(dst_path, "wb") as f:
+            f.write(frame)
+
+    def segment_folder_name(self, folder_index, risk, level, privacy=False):
         privacy_tag = "blur" if privacy else "clear"
-        folder_name = f"segment_{folder_index:04d}_{privacy_tag}_{risk}_{level}"
+        return f"segment_{folder_index:04d}_{privacy_tag}_{risk}_{level}"
+
+    def make_segment_folders(self, folder_names):
+        # 세그먼트 폴더를 한 번에 생성 (output_dir은 한 번만 만들고 폴더마다 상위 경로를 다시 확인하지 않음)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        for folder_name in folder_names:
+            try:
+                os.mkdir(self.output_dir / folder_name)
+            except FileExistsError:
+                pass
+
+    def split_segments(self, split, n_segments, folder_names, workers=1, n_frames=None):
+        # split(k)로 세그먼트 k의 프레임을 배치하고 결과를 세그먼트 순서대로 반환
+        # workers > 1: folder_names를 먼저 한 번에 만든 뒤 세그먼트들을 스레드 풀에 나눠 배치
+        # (복사/링크는 I/O 동안 GIL을 놓으므로 스레드로 충분하고, executor.map이라 결과 순서는 그대로)
+        t_start = time.time()
+        if workers > 1 and n_segments > 1:
+            self.make_segment_folders(folder_names)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(split, range(n_segments)))
+        else:
+            results = [split(k) for k in range(n_segments)]
+
+        elapsed = time.time() - t_start
+        if n_frames is None:
+            n_frames = len(folder_names) * self.max_images
+        if n_segments > 0 and elapsed > 0:
+            print(f"[✔] Preprocessed {n_segments} segments ({n_frames} frames) in {elapsed:.3f}s: "
+                  f"{n_frames / elapsed:.1f} frames/s, {n_segments / elapsed:.1f} segments/s (workers={workers})")
+        return results
+
+    def splitSegemnt(self, filename, risk, level, folder_index, file_index, new_folder = False, privacy = False):
+        folder_name = self.segment_folder_name(folder_index, risk, level, privacy)
         folder_path = self.output_dir / folder_name
 
         if new_folder:
             folder_path.mkdir(parents=True, exist_ok=True)
         
-        src_path = self.input_dir / "frame" / filename
         dst_path = folder_path / f"frame{file_index:04d}.jpg"
-        shutil.copyfile(src_path, dst_path)
+        if self.frame_store:
+            self.write_store_frame(self.get_frame_store().read([filename])[0], dst_path)
+        else:
+            src_path = self.input_dir / "frame" / filename
+            self.materialize_frame(src_path, dst_path)
         
         return folder_name
 
-    def splitSegments_all(self, frame_risk_list, privacy=False):
-        folder_index = 0
-        folder_names = []
-        
-        for i in range(0, len(frame_risk_list), self.max_images):
-            chunk = frame_risk_list[i : i + self.max_images]
-            
-            if len(chunk) < self.max_images:
-                print(f"[i] Skipping last incomplete chunk with {len(chunk)} frames.")
-                continue
-
-            folder_index += 1
-            first_frame_filename, first_frame_risk, first_frame_level = chunk[0]
-            
-            folder_name = self.splitSegemnt(
-                first_frame_filename, first_frame_risk, first_frame_level, 
-                folder_index, 0, new_folder=True, privacy=privacy
+    def splitChunk(self, chunk, folder_index, privacy=False, label=None, new_folder=True):
+        # 청크의 첫 프레임 risk/level (또는 주어진 label)로 세그먼트 폴더 이름을 정하고 모든 프레임을 배치
+        # (new_folder=False: 폴더는 make_segment_folders로 이미 만들어 둠)
+        first_frame_filename, first_frame_risk, first_frame_level = chunk[0]
+        if label is not None:
+            first_frame_risk, first_frame_level = label
+        folder_name = self.splitSegemnt(
+            first_frame_filename, first_frame_risk, first_frame_level,
+            folder_index, 0, new_folder=new_folder, privacy=privacy
+        )
+        for file_index_in_chunk, (filename, _, _) in enumerate(chunk[1:], start=1):
+            self.splitSegemnt(
+                filename, first_frame_risk, first_frame_level,
+                folder_index, file_index_in_chunk, new_folder=False, privacy=privacy
             )
-            folder_names.append(folder_name)
-            
-            for file_index_in_chunk, (filename, _, _) in enumerate(chunk[1:], start=1):
-                self.splitSegemnt(
-                    filename, first_frame_risk, first_frame_level,
-                    folder_index, file_index_in_chunk, new_folder=False, privacy=privacy
-                )
+        return folder_name
+
+    def poll_semantic_rows(self, semantic_fname=None):
+        # 라이브 모드: 분석 단계가 계속 이어 쓰는 CSV에서 새로 완성된(개행으로 끝난) 행만 읽음
+        if semantic_fname is None:
+            semantic_fname = self.semantic_fname
+        semantic_path = self.input_dir / semantic_fname
+        if not semantic_path.exists():
+            return []
+
+        with open(semantic_path, "rb") as f:
+            f.seek(self._live_offset)
+            data = f.read()
+        end = data.rfind(b"\n")
+        if end < 0:
+            return []
+        self._live_offset += end + 1
+
+        rows = [row for row in csv.reader(data[:end + 1].decode("utf-8").splitlines()) if row]
+        if self._live_columns is None and rows:
+            self._live_columns = rows.pop(0)
+            required = {"frame", "risk", "level"}
+            if not required.issubset(self._live_columns):
+                raise ValueError(f"[!] {semantic_fname} must contain {required}. got={self._live_columns}")
+
+        frame_col = self._live_columns.index("frame")
+        risk_col = self._live_columns.index("risk")
+        level_col = self._live_columns.index("level")
+        return [(row[frame_col], int(row[risk_col]), int(row[level_col])) for row in rows]
+
+    def frames_ready(self, chunk):
+        # 프레임은 캡처 단계에서 임시 이름으로 쓴 뒤 rename 된다고 가정 (존재 = 완성된 파일)
+        if self.frame_store:
+            store = self.get_frame_store()
+            store.refresh()
+            return all(store.index_of(filename) is not None for filename, _, _ in reversed(chunk))
+        frame_dir = self.input_dir / "frame"
+        return all((frame_dir / filename).exists() for filename, _, _ in reversed(chunk))
+
+    def frame_arrival_time(self, filename):
+        if self.frame_store:
+            return self.get_frame_store().arrival_time(filename)
+        return os.path.getmtime(self.input_dir / "frame" / filename)
+
+    def splitSegments_all(self, frame_risk_list, privacy=False, workers=1):
+        if len(frame_risk_list) == 0:
+            return self.splitSegments_table(np.array([], dtype=str), np.array([]), np.array([]), privacy=privacy)
+        frames, risk, level = (np.asarray(column) for column in zip(*frame_risk_list))
+        return self.splitSegments_table(frames, risk, level, privacy=privacy, workers=workers)
+
+    def splitSegments_table(self, frames, risk, level, privacy=False, workers=1):
+        # 세그먼트 경계와 라벨은 segment_labels에서 벡터 연산으로 계산하고, 여기서는 프레임 배치만 수행
+        # workers > 1: 세그먼트별 프레임 배치를 스레드 풀에서 병렬로 실행 (split_segments)
+        starts, ends = self.segment_bounds(risk, level)
+        seg_risk, seg_level = self.segment_labels(risk, level, (starts, ends))
 
+        def split(k):
+            start, end = starts[k], ends[k]
+            chunk = list(zip(frames[start:end], risk[start:end], level[start:end]))
+            return self.splitChunk(chunk, k + 1, privacy=privacy, label=(seg_risk[k], seg_level[k]),
+                                   new_folder=workers <= 1)
+
+        n_used = int(ends[-1]) if len(ends) > 0 else 0
+        folder_names = self.split_segments(
+            split, len(seg_risk),
+            [self.segment_folder_name(k + 1, seg_risk[k], seg_level[k], privacy) for k in range(len(seg_risk))],
+            workers=workers, n_frames=n_used)
+
+        tail = len(frames) - n_used
+        if tail > 0:
+            print(f"[i] Skipping last incomplete chunk with {tail} frames.")
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
         np.save(self.output_dir / 'foldername.npy', np.array(folder_names))
         return folder_names, []
 
-    def preProcessing_all (self, semantic_fname = None, privacy=False, start_frame=0, end_frame=None):
+    def preProcessing_all (self, semantic_fname = None, privacy=False, start_frame=0, end_frame=None, workers=1):
         # [수정] end_frame 파라미터 추가
         if  semantic_fname is None:
             semantic_fname = self.semantic_fname
         
-        # [수정] load_semantic_info 호출 시 end_frame 전달
-        frame_risk_list = self.load_semantic_info(semantic_fname, start_frame=start_frame, end_frame=end_frame)
+        # [수정] load_semantic_table 호출 시 end_frame 전달
+        frames, risk, level = self.load_semantic_table(semantic_fname, start_frame=start_frame, end_frame=end_frame)
+
+        folder_names, images_folder_list = self.splitSegments_table(frames, risk, level, privacy=privacy, workers=workers)
+        return folder_names, images_folder_list
+
+    def plan_segments(self, semantic_fname=None, privacy=False, start_frame=0, end_frame=None):
+        # 세그먼트 폴더를 만들지 않고 세그먼트 이름과 원본 프레임 경로만 계산 (SemantEncoder.encoding_raw 입력)
+        # frame_store 모드에서는 경로 대신 저장소 프레임(memoryview)을 넘겨 프레임 파일을 전혀 열지 않음
+        if semantic_fname is None:
+            semantic_fname = self.semantic_fname
+        frames, risk, level = self.load_semantic_table(semantic_fname, start_frame=start_frame, end_frame=end_frame)
+        starts, ends = self.segment_bounds(risk, level)
+        seg_risk, seg_level = self.segment_labels(risk, level, (starts, ends))
 
-        folder_names, images_folder_list = self.splitSegments_all(frame_risk_list, privacy=privacy)
-        return folder_names, images_folder_list
\ No newline at end of file
+        frame_dir = self.input_dir / "frame"
+        if self.frame_store:
+            store_frames = self.get_frame_store().read(list(frames[:ends[-1] if len(ends) > 0 else 0]))
+        segments = []
+        for k in range(len(seg_risk)):
+            start, end = starts[k], ends[k]
+            folder_name = self.segment_folder_name(k + 1, seg_risk[k], seg_level[k], privacy)
+            if self.frame_store:
+                segments.append((folder_name, store_frames[start:end]))
+            else:
+                segments.append((folder_name, [str(frame_dir / filename) for filename in frames[start:end]]))
+        return segments
\ No newline at end of file
@@ -19,6 +19,28 @@ output_dir_temp_clear   = "./output/temp_clear"
 output_dir_temp_privacy = "./output/temp_privacy"
 output_dir_main = "/usr/local/nginx/html/stream/hls"
 
+# True: semantic 테이블을 한 번만 읽고 clear/privacy를 같은 실행에서 동시에 인코딩
+DUAL_MODE = False
+PRIVACY_FRAME_DIR = "frame_blur"     # 여기만 바꾸면 됨: "frame_blur" 또는 "frame_faceswap"
+# 예: "privacy_boxes.csv" (frame,x,y,w,h) → blur 프레임 폴더 없이 원본 프레임의 박스 영역만 인코딩 시 blur
+PRIVACY_BOXES_FNAME = None
+
+if DUAL_MODE:
+    print("[▶] Preprocessing CLEAR + PRIVACY (dual)...")
+    pre_dual = SemantPreprocessor(
+        input_dir_pre, "./output/frames_dual", fps, max_chunk_duration, semantic_fname,
+        frame_dir_name="frame", privacy_frame_dir_name=PRIVACY_FRAME_DIR,
+        privacy_boxes_fname=PRIVACY_BOXES_FNAME
+    )
+    pre_dual.folder_init()
+    folder_pairs = pre_dual.preProcessing_dual(start_frame=START_FRAME, end_frame=END_FRAME)
+
+    print("[▶] Encoding CLEAR + PRIVACY (dual)...")
+    enc_dual = SemantEncoder("./output/frames_dual", "./output/temp_dual", output_dir_main, fps)
+    enc_dual.encoding_dual(folder_pairs, init_output=True)
+    print("[✔] Done. Both clear and privacy variants generated.")
+    raise SystemExit(0)
+
 print("[▶] Preprocessing CLEAR...")
 pre_clear = SemantPreprocessor(
     input_dir_pre, output_dir_pre_clear, fps, max_chunk_duration, semantic_fname,
@@ -28,10 +50,10 @@ pre_clear.folder_init()
 names_clear, _ = pre_clear.preProcessing_all(start_frame=START_FRAME, end_frame=END_FRAME, privacy=False)
 
 print("[▶] Preprocessing PRIVACY...")
-PRIVACY_FRAME_DIR = "frame_blur"     # 여기만 바꾸면 됨: "frame_blur" 또는 "frame_faceswap"
 pre_priv = SemantPreprocessor(
     input_dir_pre, output_dir_pre_privacy, fps, max_chunk_duration, semantic_fname,
-    frame_dir_name=PRIVACY_FRAME_DIR
+    frame_dir_name=PRIVACY_FRAME_DIR if PRIVACY_BOXES_FNAME is None else "frame",
+    privacy_boxes_fname=PRIVACY_BOXES_FNAME
 )
 pre_priv.folder_init()
 names_priv, _ = pre_priv.preProcessing_all(start_frame=START_FRAME, end_frame=END_FRAME, privacy=True)
@@ -2,29 +2,262 @@
 
 from raPreprocessor_privacy import SemantPreprocessor
 from raEncoder_privacy import SemantEncoder
+import math
 import numpy as np
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 class semanticEncoder():
     def __init__(self, input_dir_pre, output_dir_pre, fps, max_chunk_duration, semantic_fname,
                  input_dir_encode, output_dir_encode_temp, output_dir_encode_main,
-                 frame_dir_name: str = "frame"):
+                 frame_dir_name: str = "frame", privacy_frame_dir_name: str = "frame_blur",
+                 privacy_boxes_fname: str = None, segment_mode: str = "fixed", min_chunk_duration: float = 0.5,
+                 lookahead_segments: int = 1):
+        # segment_mode="risk": 세그먼트 경계를 risk/level 전환 프레임에 맞춤 (min_chunk_duration~max_chunk_duration 초,
+        # encoding_all/encoding_pipeline에 적용되고 encoding_realtime은 max_chunk_duration 고정 길이)
         self.prepro = SemantPreprocessor(input_dir_pre, output_dir_pre, fps, max_chunk_duration,
-                                         semantic_fname, frame_dir_name=frame_dir_name)
-        self.encoder = SemantEncoder(input_dir_encode, output_dir_encode_temp, output_dir_encode_main, fps)
+                                         semantic_fname, frame_dir_name=frame_dir_name,
+                                         privacy_frame_dir_name=privacy_frame_dir_name,
+                                         privacy_boxes_fname=privacy_boxes_fname,
+                                         segment_mode=segment_mode, min_chunk_duration=min_chunk_duration)
+        self.encoder = SemantEncoder(input_dir_encode, output_dir_encode_temp, output_dir_encode_main, fps,
+                                     target_duration=math.ceil(max_chunk_duration),
+                                     lookahead_segments=lookahead_segments, segment_mode=segment_mode)
         self.output_dir_pre = output_dir_pre
 
-    def encoding_all(self, enable_pre=True, start_frame=0, end_frame=None, privacy=False):
+    def encoding_all(self, enable_pre=True, start_frame=0, end_frame=None, privacy=False, dual=False,
+                     resume=False, pipeline=False, preprocess_workers=1, **pipeline_options):
+        # dual=True: clear와 privacy 세그먼트를 한 번에 전처리/인코딩 (privacy 인자는 무시)
+        # resume=True: 중단된 이전 실행의 encode_manifest.jsonl부터 이어서 인코딩 (SemantEncoder.encoding 참고)
+        # pipeline=True: 전처리와 인코딩을 세그먼트 단위로 겹쳐 실행 (encoding_pipeline, dual에는 적용되지 않음)
+        # preprocess_workers > 1: 세그먼트 프레임 배치를 스레드 풀에서 병렬로 실행
+        if enable_pre and pipeline and not dual:
+            return self.encoding_pipeline(start_frame=start_frame, end_frame=end_frame, privacy=privacy,
+                                          preprocess_workers=preprocess_workers, **pipeline_options)
+        if dual:
+            if enable_pre:
+                folder_pairs = self.prepro.preProcessing_dual(start_frame=start_frame, end_frame=end_frame,
+                                                              workers=preprocess_workers)
+            else:
+                folder_pairs = [tuple(pair) for pair in np.load(self.output_dir_pre + '/foldername.npy',
+                                                                allow_pickle=True)]
+            if len(folder_pairs) > 0:
+                self.encoder.encoding_dual(folder_pairs, resume=resume)
+            else:
+                print("[!] No segments to encode. Please check your frame range and preprocessing results.")
+            return
+
         folder_names = None
         if enable_pre:
             folder_names, _ = self.prepro.preProcessing_all(start_frame=start_frame, end_frame=end_frame,
-                                                            privacy=privacy)
+                                                            privacy=privacy, workers=preprocess_workers)
         else:
             folder_names = np.load(self.output_dir_pre + '/foldername.npy', allow_pickle=True)
 
         if folder_names is not None and len(folder_names) > 0:
-            self.encoder.encoding(list(folder_names))
+            self.encoder.encoding(list(folder_names), resume=resume)
         else:
             print("[!] No segments to encode. Please check your frame range and preprocessing results.")
 
-    def encoding_realtime(self):
-        pass
+    def encoding_pipeline(self, start_frame=0, end_frame=None,
+                          encoding_list=[("1080p","scale=1920:1080", "5000k" ),
+                                         ("720p","scale=1280:720",   "2000k" ),
+                                         ("480p","scale=854:480",   "1000k" )],
+                          single_pass=False, direct=False, privacy=False,
+                          preprocess_workers=1, encode_workers=1, queue_size=4):
+        # 전처리 → 인코딩 → m3u8 게시를 세그먼트 단위로 겹쳐 실행 (전체 전처리가 끝날 때까지 인코더가 놀지 않음)
+        # 세그먼트 라벨(폴더 이름, NEXT-SEMANTICLEVEL)은 CSV에서 먼저 한 번에 계산하고, 각 세그먼트는
+        # 전처리 풀(preprocess_workers) → 인코딩 풀(encode_workers) → 현재 스레드(순서대로 게시)로 흘러감.
+        # 단계 사이에 쌓이는 세그먼트는 queue_size 개로 제한하여 전처리가 인코딩보다 너무 앞서 나가지 않도록 함
+        t_start = time.time()
+        frames, risk, level = self.prepro.load_semantic_table(start_frame=start_frame, end_frame=end_frame)
+        starts, ends = self.prepro.segment_bounds(risk, level)
+        seg_risk, seg_level = self.prepro.segment_labels(risk, level, (starts, ends))
+        n_segments = len(seg_risk)
+        if n_segments == 0:
+            print("[!] No segments to encode. Please check your frame range and preprocessing results.")
+            return None
+
+        self.prepro.folder_init()
+        direct = self.encoder.prepare_encoding(encoding_list, True, direct)
+
+        def preprocess(k):
+            start, end = starts[k], ends[k]
+            chunk = list(zip(frames[start:end], risk[start:end], level[start:end]))
+            return self.prepro.splitChunk(chunk, k + 1, privacy=privacy, label=(seg_risk[k], seg_level[k]))
+
+        prepared = deque()  # 전처리 중인 세그먼트 (future → folder_name)
+        encoding = deque()  # 인코딩 중인 세그먼트 (folder_name, future → temp_folders)
+        folder_names = []
+        next_k = 0
+        first_segment_s = None
+
+        with ThreadPoolExecutor(max_workers=max(1, preprocess_workers)) as preprocess_pool, \
+             ThreadPoolExecutor(max_workers=max(1, encode_workers)) as encode_pool:
+            try:
+                while len(folder_names) < n_segments:
+                    while next_k < n_segments and len(prepared) < queue_size:
+                        prepared.append(preprocess_pool.submit(preprocess, next_k))
+                        next_k += 1
+                    while prepared and prepared[0].done() and len(encoding) < queue_size:
+                        folder_name = prepared.popleft().result()
+                        encoding.append((folder_name, encode_pool.submit(
+                            self.encoder.encode_segment, folder_name, encoding_list, single_pass, direct)))
+
+                    if encoding and encoding[0][1].done():
+                        folder_name, future = encoding.popleft()
+                        k = len(folder_names)
+                        next_risk_level = self.encoder.semantic_lookahead(
+                            seg_level[k + 1:k + 1 + self.encoder.lookahead_segments])
+                        self.encoder.commit_segment(folder_name, future.result(), next_risk_level)
+                        folder_names.append(folder_name)
+                        if first_segment_s is None:
+                            first_segment_s = time.time() - t_start
+                            print(f"[✔] First segment published after {first_segment_s:.3f}s")
+                        continue
+
+                    # 맨 앞 세그먼트의 전처리나 인코딩 중 하나가 끝날 때까지 대기
+                    waiting = [encoding[0][1]] if encoding else []
+                    if prepared and len(encoding) < queue_size:
+                        waiting.append(prepared[0])
+                    wait(waiting, return_when=FIRST_COMPLETED)
+            except Exception:
+                for future in list(prepared) + [future for _, future in encoding]:
+                    future.cancel()
+                raise
+
+        tail = len(frames) - int(ends[-1])
+        if tail > 0:
+            print(f"[i] Skipping last incomplete chunk with {tail} frames.")
+        np.save(self.prepro.output_dir / 'foldername.npy', np.array(folder_names))
+
+        stats = {"segments": n_segments, "first_segment_s": first_segment_s, "total_s": time.time() - t_start}
+        print(f"[✔] Pipeline finished: {n_segments} segments in {stats['total_s']:.3f}s "
+              f"(first segment after {first_segment_s:.3f}s)")
+        return stats
+
+    def encoding_realtime(self, start_frame=0, poll_interval=0.1, idle_timeout=10.0, lookahead_timeout=1.0,
+                          max_segments=None, playlist_window=None,
+                          encoding_list=[("1080p","scale=1920:1080", "5000k" ),
+                                         ("720p","scale=1280:720",   "2000k" ),
+                                         ("480p","scale=854:480",   "1000k" )],
+                          single_pass=True, direct=False, privacy=False, init_output=True, dual=False):
+        # 라이브 모드: input/<frame_dir_name> 에 도착하는 프레임과 계속 추가되는 CSV를 감시하면서
+        # max_images 개의 프레임과 risk 행이 모이는 즉시 세그먼트를 잘라 인코딩하고 m3u8에 이어붙임.
+        # 세그먼트는 다음 세그먼트 첫 행이 CSV에 들어오는 순간 NEXT-SEMANTICLEVEL과 함께 게시되고,
+        # lookahead_timeout 안에 들어오지 않으면 NEXT-SEMANTICLEVEL 없이 게시됨 (지연 상한).
+        # encoder.lookahead_segments > 1이면 그때까지 CSV에 들어온 행으로 알 수 있는 만큼 SEMANTIC-FORECAST도 게시
+        # (forecast를 채우려고 더 기다리지는 않음)
+        # dual=True 이면 같은 청크를 clear/privacy 두 세그먼트로 잘라 동시에 인코딩하고 함께 게시함.
+        max_images = self.prepro.max_images
+        self.encoder.playlist_window = playlist_window  # 예: 60 → 최근 60개 세그먼트만 m3u8에 유지
+        self.prepro.folder_init()
+        if not direct:
+            self.encoder.folder_init(self.encoder.output_dir_temp)
+        if init_output:
+            self.encoder.folder_init(self.encoder.output_dir)
+            if self.encoder.ladder_policy is not None:
+                self.encoder.create_init_m3u8(
+                    self.encoder.ladder_policy.playlist_info(encoding_list, privacy_streams=(True, False)))
+            else:
+                self.encoder.create_init_m3u8()
+
+        rows = []
+        skip_rows = start_frame
+        folder_index = 0
+        pending = None
+        latencies = []
+        frames_published = 0
+        t_first = None
+        t_last = None
+        last_activity = time.time()
+
+        executor = ThreadPoolExecutor(max_workers=2) if dual else None
+
+        def publish(pending, next_risk_level):
+            nonlocal frames_published, t_last
+            segments, glass_time, _ = pending
+            for folder_name, temp_folders in segments:
+                self.encoder.commit_segment(folder_name, temp_folders, next_risk_level, endlist=False)
+            t_last = time.time()
+            frames_published += max_images
+            latency = t_last - glass_time
+            latencies.append(latency)
+            print(f"[✔] Live segment {segments[0][0]} published, glass-to-playlist {latency:.3f}s")
+
+        print(f"[▶] Live encoding: watching {self.prepro.input_dir} (idle timeout {idle_timeout}s)")
+        try:
+            while max_segments is None or folder_index < max_segments:
+                new_rows = self.prepro.poll_semantic_rows()
+                if skip_rows > 0:
+                    dropped = min(skip_rows, len(new_rows))
+                    new_rows = new_rows[dropped:]
+                    skip_rows -= dropped
+                if new_rows:
+                    rows.extend(new_rows)
+                    last_activity = time.time()
+
+                if pending is not None and rows:
+                    # CSV에 이미 들어온 행으로 알 수 있는 다음 세그먼트들의 (첫 행) level
+                    publish(pending, self.encoder.semantic_lookahead(
+                        row[2] for row in rows[:self.encoder.lookahead_segments * max_images:max_images]))
+                    pending = None
+                elif pending is not None and time.time() - pending[2] > lookahead_timeout:
+                    publish(pending, None)
+                    pending = None
+
+                ready = len(rows) >= max_images and self.prepro.frames_ready(rows[:max_images])
+                if ready and dual:
+                    ready = self.prepro.frames_ready(rows[:max_images], self.prepro.privacy_source_dir())
+                if ready:
+                    chunk = rows[:max_images]
+                    del rows[:max_images]
+                    glass_time = self.prepro.frame_arrival_time(chunk[0][0])
+                    if t_first is None:
+                        t_first = glass_time
+
+                    folder_index += 1
+                    if dual:
+                        folder_names = [
+                            self.prepro.splitChunk(chunk, folder_index, privacy=False),
+                            self.prepro.splitChunk(chunk, folder_index, privacy=True,
+                                                   frame_dir_name=self.prepro.privacy_source_dir())]
+                        futures = [executor.submit(self.encoder.encode_segment, folder_name, encoding_list,
+                                                   single_pass, direct) for folder_name in folder_names]
+                        segments = [(folder_name, future.result()) for folder_name, future in zip(folder_names, futures)]
+                    else:
+                        folder_name = self.prepro.splitChunk(chunk, folder_index, privacy=privacy)
+                        segments = [(folder_name, self.encoder.encode_segment(folder_name, encoding_list,
+                                                                               single_pass, direct))]
+                    pending = (segments, glass_time, time.time())
+                    last_activity = time.time()
+                    continue
+
+                if time.time() - last_activity > idle_timeout:
+                    print(f"[i] No new frames for {idle_timeout}s, stopping live encoding.")
+                    break
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            print("[i] Live encoding interrupted.")
+
+        if pending is not None:
+            publish(pending, None)
+        if executor is not None:
+            executor.shutdown()
+        if folder_index > 0:
+            if dual:
+                self.encoder.close_m3u8_files(encoding_list, privacy=False)
+                self.encoder.close_m3u8_files(encoding_list, privacy=True)
+            else:
+                self.encoder.close_m3u8_files(encoding_list, privacy=privacy)
+
+        stats = {"segments": folder_index, "frames": frames_published}
+        if latencies:
+            elapsed = t_last - t_first
+            stats["fps"] = frames_published / elapsed if elapsed > 0 else 0.0
+            stats["latency_avg"] = sum(latencies) / len(latencies)
+            stats["latency_max"] = max(latencies)
+            print(f"[✔] Live encoding finished: {folder_index} segments, {stats['fps']:.1f} frames/sec sustained, "
+                  f"glass-to-playlist avg {stats['latency_avg']:.3f}s / max {stats['latency_max']:.3f}s")
+        return stats
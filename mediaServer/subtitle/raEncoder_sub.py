@@ -1,17 +1,823 @@
 # raEncoder_sub.py
 
 import subprocess
+from collections import deque
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import shutil
 import os
+import hashlib
+import json
+import tempfile
+import threading
+import time
+import re
+
+
+class M3u8Writer ():
+    # 해상도별 m3u8 내용을 메모리에 유지하면서 세그먼트 항목을 이어붙이고,
+    # 게시할 때만 임시 파일에 쓴 뒤 rename 하여 플레이어가 쓰다 만 파일을 읽지 않도록 함
+    def __init__ (self, path, window=None, part_window=None):
+        self.path = path
+        self.window = window
+        self.part_window = part_window  # LL-HLS: 최근 part_window개 세그먼트에만 #EXT-X-PART를 남김
+        self.header = []
+        self.entries = deque()
+        self.media_sequence = 0
+        self.last_entry = []
+        self.tail = []  # LL-HLS: 아직 닫히지 않은 세그먼트의 태그/part/PRELOAD-HINT (다음 append에서 비워짐)
+
+    def start(self, lines):
+        # ffmpeg가 만든 첫 세그먼트 m3u8을 헤더와 첫 항목으로 분리
+        lines = [line for line in lines if line.strip() != "#EXT-X-ENDLIST"]
+        split_index = len(lines)
+        for i, line in enumerate(lines):
+            if line.startswith("#EXT-X-SEMANTICTYPE"):
+                split_index = i
+                break
+        self.header = lines[:split_index]
+        if self.window is not None:
+            # 슬라이딩 윈도우에서는 세그먼트가 빠지므로 EVENT 타입을 쓸 수 없음
+            self.header = [line for line in self.header if not line.startswith("#EXT-X-PLAYLIST-TYPE")]
+        self.entries.clear()
+        self.media_sequence = 0
+        self.tail = []
+        if lines[split_index:]:
+            self.append(lines[split_index:])
+
+    def append(self, entry_lines):
+        self.entries.append(entry_lines)
+        self.last_entry = entry_lines
+        self.tail = []
+        if self.window is not None:
+            while len(self.entries) > self.window:
+                self.entries.popleft()
+                self.media_sequence += 1
+
+    def publish(self, endlist=True):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for line in self.header:
+                if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+                    line = f"#EXT-X-MEDIA-SEQUENCE:{self.media_sequence}\n"
+                f.write(line)
+            for i, entry_lines in enumerate(self.entries):
+                if self.part_window is not None and i < len(self.entries) - self.part_window:
+                    entry_lines = [line for line in entry_lines if not line.startswith("#EXT-X-PART:")]
+                f.writelines(entry_lines)
+            f.writelines(self.tail)
+            if endlist:
+                f.write("#EXT-X-ENDLIST\n")
+        os.replace(tmp_path, self.path)
+
+
+class EncodeCache ():
+    # 세그먼트 프레임 내용과 인코딩 파라미터의 해시를 키로 인코딩된 .ts를 보관하는 영구 캐시
+    # (용량이 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제)
+    def __init__ (self, cache_dir, max_bytes=20 * 1024 ** 3):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = sum(path.stat().st_size for path in self.cache_dir.glob("*.ts"))
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def hash_frames(self, input_foler_path):
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(input_foler_path)):
+            if not name.startswith("frame"):
+                continue
+            digest.update(name.encode())
+            with open(os.path.join(input_foler_path, name), "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def make_key(self, frames_digest, params):
+        return hashlib.sha256((frames_digest + "|" + " ".join(params)).encode()).hexdigest()
+
+    def fetch(self, key, dst_path):
+        cache_path = self.cache_dir / f"{key}.ts"
+        try:
+            shutil.copyfile(cache_path, dst_path)
+            os.utime(cache_path)  # LRU를 위해 마지막 사용 시각 갱신
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store(self, key, src_path):
+        cache_path = self.cache_dir / f"{key}.ts"
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(src_path, tmp_path)
+        with self.lock:
+            # 같은 key를 다시 저장하면 (동시에 같은 세그먼트를 인코딩한 경우 등) 기존 항목 크기를 빼고 교체
+            old_size = cache_path.stat().st_size if cache_path.exists() else 0
+            os.replace(tmp_path, cache_path)
+            self.total_bytes += cache_path.stat().st_size - old_size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        entries = []
+        for path in self.cache_dir.glob("*.ts"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            print(f"[i] Encode cache evicted {path.name}")
+        self.total_bytes = total
+
+
+class EncodeManifest ():
+    # encoding()이 게시를 마친 세그먼트마다 m3u8에 추가한 항목을 output_dir/encode_manifest.jsonl에 한 줄(JSON)씩 기록
+    # 중단 후 다시 실행하면 기록과 .ts를 검증하여 m3u8을 기록 그대로 복원하고 다음 세그먼트부터 이어서 인코딩함
+    #   첫 줄: 실행 설정 {"encoding_list": ..., 프로파일/ladder 규칙/framerate/target_duration/segment_mode/lookahead}
+    #          (설정이 바뀌면 기록을 버리고 처음부터)
+    #   세그먼트 줄: {"folder", "playlists": {m3u8 이름: 항목 줄들}, "sizes": {파일 이름: 크기}, "headers"(처음 한 번)}
+    def __init__ (self, path, encoding_list, settings=None):
+        self.path = path
+        self.output_dir = os.path.dirname(path)
+        # JSON으로 한 번 돌려 tuple 등을 기록과 같은 형태로 맞춤 (load에서 첫 줄과 그대로 비교)
+        self.config = json.loads(json.dumps({"encoding_list": [list(rendition) for rendition in encoding_list],
+                                             **(settings or {})}))
+        self.headers_written = set()
+
+    def start(self, records=()):
+        # 설정 줄과 (이어서 쓸) 기존 기록으로 manifest를 새로 씀
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.config) + "\n")
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.headers_written = set(name for record in records for name in record.get("headers", {}))
+
+    def load(self):
+        # 설정이 같을 때 완성된 줄의 기록만 반환 (마지막 줄을 쓰다가 중단되었으면 그 줄은 무시)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().split("\n")[:-1]
+        except FileNotFoundError:
+            return []
+        if not lines or json.loads(lines[0]) != self.config:
+            print(f"[i] Encode manifest does not match the current encoding settings, starting over: {self.path}")
+            return []
+        records = []
+        for line in lines[1:]:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+        return records
+
+    def append(self, folder_name, writers):
+        # writers: {m3u8 이름: 이번 세그먼트 항목을 추가한 M3u8Writer}
+        record = {"folder": folder_name, "playlists": {}, "sizes": {}}
+        for name, writer in writers.items():
+            record["playlists"][name] = writer.last_entry
+            # LadderPolicy가 건너뛴 해상도의 #EXT-X-GAP 항목은 .ts가 없으므로 크기를 기록하지 않음 (media_ok도 검사 안 함)
+            gap = False
+            for line in "".join(writer.last_entry).splitlines():
+                line = line.strip()
+                if line == "#EXT-X-GAP":
+                    gap = True
+                elif line and not line.startswith("#"):
+                    if not gap:
+                        record["sizes"][line] = os.path.getsize(os.path.join(self.output_dir, line))
+                    gap = False
+        headers = {name: writer.header for name, writer in writers.items() if name not in self.headers_written}
+        if headers:
+            record["headers"] = headers
+            self.headers_written.update(headers)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def media_ok(self, record):
+        # 기록된 .ts/.vtt가 모두 같은 크기로 남아 있고 .ts는 TS sync byte로 시작하는지 확인
+        for name, size in record.get("sizes", {}).items():
+            media_path = os.path.join(self.output_dir, name)
+            try:
+                if os.path.getsize(media_path) != size:
+                    return False
+                with open(media_path, "rb") as f:
+                    head = f.read(1)
+            except OSError:
+                return False
+            if name.endswith(".ts") and head != b"\x47":
+                return False
+        return True
+
+
+class LadderPolicy ():
+    # 세그먼트의 risk type/level과 privacy로 세그먼트별 인코딩 사다리(bitrate/preset)를 결정
+    # rules는 순서대로 검사하여 조건이 맞는 첫 규칙을 적용 (맞는 규칙이 없으면 encoding_list 그대로)
+    #   조건: "risk_type", "min_level", "max_level", "privacy" (생략한 조건은 검사하지 않음)
+    #   동작: "preset", "bitrate": {prefix: bitrate}, "skip": [prefix, ...]
+    # 예) [{"max_level": 0, "preset": "veryfast", "skip": ["1080p"], "bitrate": {"480p": "800k"}},
+    #      {"min_level": 2, "preset": "slow", "bitrate": {"1080p": "8000k"}}]
+    # 건너뛴 해상도는 #EXT-X-GAP 항목으로 남겨 모든 m3u8의 세그먼트 순서를 master와 맞춤
+    # (default_preset=None: 규칙에 preset이 없으면 인코더의 encode_profile preset 사용)
+    def __init__ (self, rules, default_preset=None):
+        self.rules = rules
+        self.default_preset = default_preset
+
+    def match(self, risk_type, risk_level, privacy):
+        for rule in self.rules:
+            if "risk_type" in rule and int(rule["risk_type"]) != int(risk_type):
+                continue
+            if "min_level" in rule and int(risk_level) < int(rule["min_level"]):
+                continue
+            if "max_level" in rule and int(risk_level) > int(rule["max_level"]):
+                continue
+            if "privacy" in rule and bool(rule["privacy"]) != bool(privacy):
+                continue
+            return rule
+        return {}
+
+    def plan(self, encoding_list, risk_type, risk_level, privacy):
+        # (이 세그먼트의 encoding_list, 건너뛸 prefix 목록, preset) 반환
+        rule = self.match(risk_type, risk_level, privacy)
+        bitrates = rule.get("bitrate", {})
+        skip = set(rule.get("skip", []))
+
+        segment_list = [(segment_prefix, scale, bitrates.get(segment_prefix, bitrate))
+                        for segment_prefix, scale, bitrate in encoding_list if segment_prefix not in skip]
+        skipped = [segment_prefix for segment_prefix, _, _ in encoding_list if segment_prefix in skip]
+        if not segment_list:
+            raise ValueError(f"[!] Ladder policy skips every rendition for risk {risk_type}/{risk_level}")
+        return segment_list, skipped, rule.get("preset", self.default_preset)
+
+    def playlist_info(self, encoding_list, privacy_streams=(False,)):
+        # master의 BANDWIDTH는 규칙이 올릴 수 있는 최대 bitrate 기준으로 기록
+        info = []
+        for segment_prefix, scale, bitrate in encoding_list:
+            peak = self.bitrate_bps(bitrate)
+            for rule in self.rules:
+                if segment_prefix in rule.get("bitrate", {}):
+                    peak = max(peak, self.bitrate_bps(rule["bitrate"][segment_prefix]))
+            resolution = scale.split("=")[-1].replace(":", "x")
+            for privacy in privacy_streams:
+                info.append((segment_prefix, resolution, peak, privacy))
+        return info
+
+    @staticmethod
+    def bitrate_bps(bitrate):
+        bitrate = str(bitrate)
+        if bitrate[-1] in "kK":
+            return int(float(bitrate[:-1]) * 1000)
+        if bitrate[-1] in "mM":
+            return int(float(bitrate[:-1]) * 1000000)
+        return int(bitrate)
+
+
+class EncodeProfile ():
+    # libx264 인코딩 설정 묶음 (preset/tune/threads/slices/rate control/lookahead)
+    # SemantEncoder(encode_profile=...)에 이름이나 EncodeProfile을 주면 모든 인코딩 경로(temp/direct/raw/persistent)에 적용
+    #   rate_control: "abr"  → -b:v (기존 방식)
+    #                 "vbr"  → -b:v + -maxrate (bitrate * maxrate_factor) / -bufsize (bitrate * bufsize_factor)
+    #                 "crf"  → -crf 로 화질 고정, -maxrate bitrate로 상한 (master BANDWIDTH를 넘지 않음)
+    # LadderPolicy 규칙의 "preset"이 있으면 프로파일 preset보다 우선
+    def __init__ (self, name, preset="fast", tune=None, threads=None, slices=None, rate_control="abr", crf=23,
+                  maxrate_factor=1.0, bufsize_factor=2.0, rc_lookahead=None):
+        if rate_control not in ("abr", "vbr", "crf"):
+            raise ValueError(f"[!] Unknown rate control: {rate_control} (abr, vbr, crf)")
+        self.name = name
+        self.preset = preset
+        self.tune = tune
+        self.threads = threads
+        self.slices = slices
+        self.rate_control = rate_control
+        self.crf = crf
+        self.maxrate_factor = maxrate_factor
+        self.bufsize_factor = bufsize_factor
+        self.rc_lookahead = rc_lookahead
+
+    @staticmethod
+    def get(profile):
+        # 이름 또는 EncodeProfile → EncodeProfile
+        if isinstance(profile, EncodeProfile):
+            return profile
+        if profile not in ENCODE_PROFILES:
+            raise ValueError(f"[!] Unknown encode profile: {profile} ({', '.join(ENCODE_PROFILES)})")
+        return ENCODE_PROFILES[profile]
+
+    def rate_args(self, bitrate, stream=""):
+        # stream: 한 ffmpeg 출력에 여러 스트림이 있을 때의 지정자 (예: ":0" → -b:v:0)
+        bps = LadderPolicy.bitrate_bps(bitrate)
+        if self.rate_control == "abr":
+            return [f"-b:v{stream}", bitrate]
+        if self.rate_control == "vbr":
+            return [f"-b:v{stream}", bitrate,
+                    f"-maxrate:v{stream}", str(int(bps * self.maxrate_factor)),
+                    f"-bufsize:v{stream}", str(int(bps * self.bufsize_factor))]
+        return [f"-crf:v{stream}", str(self.crf),
+                f"-maxrate:v{stream}", str(bps),
+                f"-bufsize:v{stream}", str(int(bps * self.bufsize_factor))]
+
+    def tuning_args(self, preset=None):
+        args = ["-preset", preset or self.preset]
+        if self.tune:
+            args += ["-tune", self.tune]
+        if self.threads is not None:
+            args += ["-threads", str(self.threads)]
+        if self.slices is not None:
+            args += ["-slices", str(self.slices)]
+        if self.rc_lookahead is not None:
+            args += ["-rc-lookahead", str(self.rc_lookahead)]
+        return args
+
+
+ENCODE_PROFILES = {
+    # 기존 명령과 같은 설정
+    "default": EncodeProfile("default"),
+    # 라이브: 프레임 지연 없는 zerolatency (B-frame/lookahead 없음), slice 단위 병렬 처리, VBV로 세그먼트 크기 고정
+    "latency": EncodeProfile("latency", preset="veryfast", tune="zerolatency", slices=4, rate_control="vbr",
+                             bufsize_factor=1.0),
+    # 카메라 여러 대: 인코더당 스레드 1개로 코어 수만큼 스트림을 동시에 돌릴 때 총 처리량이 가장 높음
+    "throughput": EncodeProfile("throughput", preset="superfast", threads=1, rate_control="vbr",
+                                maxrate_factor=1.5, rc_lookahead=10),
+    # 녹화/VOD: 느린 preset과 긴 lookahead, bitrate 상한 안에서 CRF로 화질 고정
+    "quality": EncodeProfile("quality", preset="slow", rate_control="crf", crf=21, rc_lookahead=40),
+}
+
+
+def load_frame(frame):
+    # 프레임 경로면 파일을 읽고, FrameStore에서 온 bytes-like(memoryview)면 그대로 반환
+    if isinstance(frame, (str, os.PathLike)):
+        with open(frame, "rb") as f:
+            return f.read()
+    return frame
+
+
+class RawFrameReader ():
+    # JPEG 프레임 목록(경로 또는 FrameStore memoryview)을 하나의 ffmpeg 디코더(image2pipe → rawvideo)로 한 번만 디코딩하여
+    # 재사용 버퍼에 한 프레임씩 채워 주는 리더. 디코더 stdin은 별도 스레드가 채우고,
+    # 읽는 쪽(인코더 파이프)이 밀리면 파이프가 차서 디코더와 입력 스레드가 함께 멈춤 (backpressure)
+    def __init__ (self, frame_paths, pix_fmt="yuv420p"):
+        self.frame_paths = list(frame_paths)
+        if not self.frame_paths:
+            raise ValueError("[!] RawFrameReader needs at least one frame")
+        if pix_fmt not in ("yuv420p", "rgb24"):
+            raise ValueError(f"[!] pix_fmt must be one of yuv420p/rgb24. got={pix_fmt}")
+        self.pix_fmt = pix_fmt
+        self.width, self.height = self.jpeg_size(self.frame_paths[0])
+        if pix_fmt == "yuv420p":
+            self.frame_bytes = self.width * self.height * 3 // 2
+        else:
+            self.frame_bytes = self.width * self.height * 3
+        self.buffer = bytearray(self.frame_bytes)
+        self.view = memoryview(self.buffer)
+
+        cmd = [
+            "ffmpeg", "-loglevel", "error",
+            "-f", "image2pipe", "-c:v", "mjpeg", "-i", "-",
+            "-fps_mode", "passthrough", "-f", "rawvideo", "-pix_fmt", pix_fmt, "-"
+        ]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.feeder = threading.Thread(target=self._feed, daemon=True)
+        self.feeder.start()
+
+    def _feed(self):
+        try:
+            for frame in self.frame_paths:
+                self.proc.stdin.write(load_frame(frame))
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def read(self):
+        # 다음 프레임을 재사용 버퍼에 채워 memoryview로 반환 (다음 read 전에 소비해야 함), 끝이면 None
+        filled = 0
+        while filled < self.frame_bytes:
+            n = self.proc.stdout.readinto(self.view[filled:])
+            if not n:
+                if filled == 0:
+                    return None
+                raise ValueError(f"[!] Truncated raw frame from decoder ({filled}/{self.frame_bytes} bytes)")
+            filled += n
+        return self.view
+
+    def frames(self, n_frames):
+        for _ in range(n_frames):
+            frame = self.read()
+            if frame is None:
+                raise ValueError("[!] Decoder ended before all frames were read")
+            yield frame
+
+    def close(self):
+        self.proc.stdout.close()
+        self.proc.wait()
+        self.feeder.join()
+
+    @staticmethod
+    def jpeg_size(path):
+        # 디코딩 없이 JPEG SOF 마커에서 (width, height)를 읽음
+        data = load_frame(path)
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                height = int.from_bytes(data[i + 5:i + 7], "big")
+                width = int.from_bytes(data[i + 7:i + 9], "big")
+                return width, height
+            if marker == 0xFF:
+                i += 1
+            elif marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+                i += 2
+            else:
+                i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+        raise ValueError(f"[!] Cannot read JPEG size: {path}")
+
+
+class PersistentSegmenter ():
+    # 스트림 전체에서 ffmpeg 하나를 유지하며 (세그먼트마다 프로세스를 띄우지 않음) JPEG 프레임을 stdin(image2pipe)으로 받아
+    # segment muxer로 해상도별 .ts를 segment_time 단위로 잘라 내고, 모든 해상도에서 닫힌 세그먼트부터
+    # SemantEncoder.commit_segment로 SEMANTIC 태그와 함께 m3u8에 게시
+    # (세그먼트 k는 다음 세그먼트의 첫 키프레임이 인코딩되어야 닫히므로 NEXT-SEMANTICLEVEL은 항상 알려져 있음)
+    # segment_lengths(세그먼트별 프레임 수)를 알면 그 경계에서 정확히 자르고, 모르면(라이브) segment_time 단위로 자름
+    # encoder.part_duration이 있으면 (LL-HLS) tee muxer로 같은 인코딩 결과를 part 단위로도 잘라
+    # {prefix}_part_%06d.ts로 내보내고, 닫힌 part를 부모 세그먼트가 닫히기 전부터 m3u8 끝에 게시
+    # (같은 feed에 같은 folder_name을 이어서 주면 한 세그먼트의 프레임을 part 단위로 나눠 넣을 수 있음)
+    def __init__ (self, encoder, encoding_list, segment_time=1, preset=None, endlist=True, segment_lengths=None,
+                  segment_names=None):
+        self.encoder = encoder
+        self.encoding_list = encoding_list
+        self.segment_time = segment_time
+        self.segment_lengths = segment_lengths
+        self.segment_names = segment_names  # 배치 모드의 전체 세그먼트 이름 (없으면 feed된 세그먼트까지만 lookahead)
+        self.preset = preset
+        self.endlist = endlist
+        self.proc = None
+        self.list_paths = []
+        self.list_offsets = []
+        self.folder_names = []
+        self.frame_counts = {}
+        self.closed = {}
+        self.committed = 0
+        self.suffix = ""
+        # LL-HLS part 상태 (해상도별): 닫힌 part 수, 다음 part의 (세그먼트, 세그먼트 내 번호), 세그먼트별 part 목록
+        self.part_frames = None
+        if encoder.part_duration:
+            self.part_frames = max(1, round(encoder.part_duration * encoder.framerate))
+            segment_frames = round(segment_time * encoder.framerate)
+            if segment_lengths is None and segment_frames % self.part_frames != 0:
+                raise ValueError(f"[!] part_duration must divide the segment duration in live mode. "
+                                 f"got part={self.part_frames} frames, segment={segment_frames} frames")
+        self.part_list_paths = []
+        self.part_list_offsets = []
+        self.part_counts = []
+        self.part_cursors = []
+        self.parts = []
+        self.published_parts = []
+
+    def split_options(self, boundaries, segment_time):
+        # segment muxer 분할 옵션: 경계 프레임 목록을 알면 segment_frames, 모르면 segment_time
+        if boundaries is not None:
+            return [("segment_frames", ",".join(str(b) for b in boundaries))]
+        return [("segment_time", str(segment_time)), ("segment_time_delta", str(0.5 / self.encoder.framerate))]
+
+    def start(self, folder_name, frame_paths):
+        privacy = folder_name.split("_")[-3]
+        self.suffix = suffix = "_privacy" if privacy == "blur" else ""
+
+        n_outputs = len(self.encoding_list)
+        split_labels = "".join(f"[s{k}]" for k in range(n_outputs))
+        filter_graph = [f"[0:v]split={n_outputs}{split_labels}"]
+        filter_graph += [f"[s{k}]{scale}[v{k}]" for k, (_, scale, _) in enumerate(self.encoding_list)]
+
+        Path(self.encoder.output_dir_temp).mkdir(parents=True, exist_ok=True)
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            # 입력 분석 때문에 첫 몇 MB를 쌓아 두지 않도록 (라이브에서 첫 세그먼트가 끝까지 밀리는 문제)
+            "-probesize", "32", "-analyzeduration", "0",
+            "-f", "image2pipe", "-c:v", "mjpeg", "-framerate", str(self.encoder.framerate), "-i", "-",
+            "-filter_complex", ";".join(filter_graph),
+        ]
+        boundaries = None
+        part_boundaries = None
+        if self.segment_lengths:
+            boundaries = []
+            part_boundaries = []
+            segment_start = 0
+            for n_frames in self.segment_lengths:
+                if self.part_frames:
+                    part_boundaries += list(range(segment_start, segment_start + n_frames, self.part_frames))
+                segment_start += n_frames
+                boundaries.append(segment_start)
+            boundaries = boundaries[:-1]
+            part_boundaries = part_boundaries[1:]
+            # 시각 목록(b / framerate)은 반올림 때문에 한 프레임 늦게 걸릴 수 있으므로 프레임 번호로 지정
+            force_key_frames = "expr:" + "+".join(f"eq(n,{b})" for b in [0] + boundaries)
+        else:
+            force_key_frames = f"expr:gte(t,n_forced*{self.segment_time})"
+        split_options = self.split_options(boundaries, self.segment_time)
+        start_number = folder_name.split("_")[-4].lstrip("0") or "0"
+        for k, (segment_prefix, _, bitrate) in enumerate(self.encoding_list):
+            list_path = self.encoder.output_dir_temp + "/" + f"{segment_prefix}{suffix}_segments.csv"
+            if os.path.exists(list_path):
+                os.remove(list_path)
+            self.list_paths.append(list_path)
+            self.list_offsets.append(0)
+            segment_path = self.encoder.output_dir + "/" + f"{segment_prefix}_%04d{suffix}.ts"
+            if not self.part_frames:
+                split_args = [arg for key, value in split_options for arg in ("-" + key, value)]
+                cmd += ["-map", f"[v{k}]"] + self.encoder.direct_output_args(bitrate, self.preset, "segment",
+                                                                              force_key_frames) + split_args + [
+                    "-segment_format", "mpegts",
+                    "-segment_start_number", start_number,
+                    "-segment_list", list_path, "-segment_list_type", "csv",
+                    segment_path
+                ]
+                continue
+
+            # LL-HLS: 인코딩 한 번의 결과를 tee로 part 분할(키프레임이 아닌 곳에서도 자름)과 세그먼트 분할에 함께 보냄
+            # (part 출력을 먼저 두어, 세그먼트가 목록에 보이면 그 세그먼트의 part도 이미 목록에 있도록 함)
+            part_list_path = self.encoder.output_dir_temp + "/" + f"{segment_prefix}{suffix}_parts.csv"
+            if os.path.exists(part_list_path):
+                os.remove(part_list_path)
+            self.part_list_paths.append(part_list_path)
+            self.part_list_offsets.append(0)
+            self.part_counts.append(0)
+            self.part_cursors.append((0, 0))
+            self.parts.append({})
+            self.published_parts.append(None)
+            part_options = self.split_options(part_boundaries, self.part_frames / self.encoder.framerate) + [
+                ("break_non_keyframes", "1"), ("segment_start_number", "0"),
+                ("segment_list", part_list_path), ("segment_list_type", "csv")]
+            segment_options = split_options + [
+                ("segment_start_number", start_number),
+                ("segment_list", list_path), ("segment_list_type", "csv")]
+            tee_outputs = [
+                (part_options, self.encoder.output_dir + "/" + f"{segment_prefix}_part_%06d{suffix}.ts"),
+                (segment_options, segment_path),
+            ]
+            cmd += ["-map", f"[v{k}]"] + self.encoder.direct_output_args(bitrate, self.preset, "tee",
+                                                                          force_key_frames) + [
+                "|".join("[f=segment:segment_format=mpegts:" + ":".join(f"{key}={value}" for key, value in options)
+                         + "]" + path for options, path in tee_outputs)
+            ]
+        print(f"[▶] Running persistent FFmpeg ({n_outputs} renditions) : {' '.join(cmd)}")
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def feed(self, folder_name, frame_paths):
+        # 세그먼트 하나의 프레임을 인코더에 흘려 넣고, 그 사이 닫힌 세그먼트들을 게시하여 folder_name 목록으로 반환
+        if self.proc is None:
+            self.start(folder_name, frame_paths)
+        if self.folder_names and self.folder_names[-1] == folder_name:
+            self.frame_counts[folder_name] += len(frame_paths)
+        else:
+            self.folder_names.append(folder_name)
+            self.frame_counts[folder_name] = len(frame_paths)
+        for frame in frame_paths:
+            self.proc.stdin.write(load_frame(frame))  # 인코더가 밀리면 파이프가 차서 여기서 대기
+        self.proc.stdin.flush()
+        return self.commit_closed()
+
+    def read_list(self, list_path, offset):
+        # segment muxer 목록(CSV: 파일명,시작,끝)에서 offset 이후 새로 추가된 완성된 줄의 파일명과 새 offset
+        if not os.path.exists(list_path):
+            return [], offset
+        with open(list_path, "r") as f:
+            f.seek(offset)
+            data = f.read()
+        complete = data[:data.rfind("\n") + 1]
+        return [line.rsplit(",", 2)[0] for line in complete.splitlines()], offset + len(complete)
+
+    def segment_part_count(self, i):
+        # i번째 세그먼트의 part 수 (라이브에서 아직 프레임이 다 들어오지 않은 세그먼트는 segment_time 기준)
+        if self.segment_lengths:
+            n_frames = self.segment_lengths[i]
+        else:
+            n_frames = round(self.segment_time * self.encoder.framerate)
+        return -(-n_frames // self.part_frames)
+
+    def read_parts(self):
+        # 해상도별로 새로 닫힌 part를 순서대로 세그먼트에 배정 ((URI, 길이) 목록)
+        for k, part_list_path in enumerate(self.part_list_paths):
+            part_names, self.part_list_offsets[k] = self.read_list(part_list_path, self.part_list_offsets[k])
+            for part_name in part_names:
+                i, j = self.part_cursors[k]
+                n_frames = self.part_frames
+                if i < len(self.folder_names):
+                    n_frames = min(n_frames, self.frame_counts[self.folder_names[i]] - j * self.part_frames)
+                self.parts[k].setdefault(i, []).append((part_name, n_frames / self.encoder.framerate))
+                self.part_counts[k] += 1
+                self.part_cursors[k] = (i + 1, 0) if j + 1 >= self.segment_part_count(i) else (i, j + 1)
+
+    def commit_closed(self, final=False):
+        # segment muxer 목록에 새로 추가된 줄을 읽어, 모든 해상도가 닫힌 세그먼트를 순서대로 게시
+        # (목록의 시간은 muxer의 시작 pts 오프셋이 섞여 있으므로 EXTINF는 넣은 프레임 수로 계산)
+        for k, list_path in enumerate(self.list_paths):
+            ts_names, self.list_offsets[k] = self.read_list(list_path, self.list_offsets[k])
+            for ts_name in ts_names:
+                ts_index = int(ts_name[len(self.encoding_list[k][0]) + 1:].split("_")[0].split(".")[0])
+                self.closed.setdefault(ts_index, set()).add(self.encoding_list[k][0])
+        if self.part_frames:
+            self.read_parts()
+
+        published = []
+        while self.committed < len(self.folder_names):
+            folder_name = self.folder_names[self.committed]
+            if len(self.closed.get(int(folder_name.split("_")[-4]), ())) < len(self.encoding_list):
+                break
+            names = self.segment_names or self.folder_names
+            if self.committed + 1 < len(names):
+                next_risk_level = self.encoder.next_risk_level(names, self.committed)
+            elif final:
+                next_risk_level = None
+            else:
+                break
+            duration = self.frame_counts[folder_name] / self.encoder.framerate
+            if self.part_frames:
+                self.encoder.partial_segments[folder_name] = {
+                    segment_prefix: self.parts[k].pop(self.committed, [])
+                    for k, (segment_prefix, _, _) in enumerate(self.encoding_list)}
+            self.encoder.commit_segment(folder_name, [(segment_prefix, None, duration)
+                                                      for segment_prefix, _, _ in self.encoding_list],
+                                        next_risk_level, endlist=self.endlist)
+            published.append(folder_name)
+            self.committed += 1
+
+        if self.part_frames and not self.endlist and not final:
+            self.publish_parts()
+        return published
+
+    def publish_parts(self):
+        # 아직 게시되지 않은 첫 세그먼트의 SEMANTIC 태그와 닫힌 part, 다음 part의 PRELOAD-HINT를 해상도별 m3u8 끝에 게시
+        # (세그먼트 라벨은 첫 프레임에서 정해지므로 part가 하나도 닫히기 전에도 태그를 먼저 알림)
+        if self.committed >= len(self.folder_names):
+            return
+        folder_name = self.folder_names[self.committed]
+        for k, (segment_prefix, _, _) in enumerate(self.encoding_list):
+            parts = self.parts[k].get(self.committed, [])
+            state = (self.committed, len(parts))
+            if self.published_parts[k] == state:
+                continue
+            self.published_parts[k] = state
+            preload_uri = f"{segment_prefix}_part_{self.part_counts[k]:06d}{self.suffix}.ts"
+            self.encoder.publish_partial_segment(folder_name, segment_prefix, parts, preload_uri)
+
+    def close(self):
+        # 입력을 닫아 마지막 세그먼트까지 내보내고 남은 세그먼트를 모두 게시
+        if self.proc is None:
+            return []
+        self.proc.stdin.close()
+        returncode = self.proc.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, "ffmpeg (persistent)")
+        return self.commit_closed(final=True)
+
+
+class VttPlaylistWriter ():
+    # 비디오 세그먼트와 같은 경계로 WebVTT 조각(subtitles_0001.vtt ...)을 쓰고 자막 media playlist(subtitles.m3u8)에 이어붙임
+    # 조각마다 X-TIMESTAMP-MAP으로 cue 시간(LOCAL)과 같은 번호 .ts의 첫 PTS(MPEGTS)를 연결하므로
+    # 세그먼트마다 PTS가 다시 시작하는 인코딩과 PTS가 이어지는 persistent 인코딩 모두 비디오와 맞게 정렬됨
+    DEFAULT_MPEGTS = 126000  # .ts를 읽을 수 없을 때 사용하는 ffmpeg mpegts 기본 시작 PTS (1.4초, 90kHz)
+
+    def __init__ (self, output_dir, playlist_name="subtitles.m3u8", fragment_prefix="subtitles", window=None,
+                  target_duration=1, merge=True):
+        self.output_dir = output_dir
+        self.playlist_name = playlist_name
+        self.fragment_prefix = fragment_prefix
+        self.writer = M3u8Writer(output_dir + "/" + playlist_name, window=window)
+        self.writer.header = ["#EXTM3U\n", "#EXT-X-VERSION:3\n", f"#EXT-X-TARGETDURATION:{target_duration}\n",
+                              "#EXT-X-MEDIA-SEQUENCE:0\n"]
+        if window is None:
+            self.writer.header.append("#EXT-X-PLAYLIST-TYPE:EVENT\n")
+        # merge=True: 같은 문구가 이어지는 세그먼트들의 cue를 하나로 합쳐 걸치는 모든 조각에 같은 시간으로 기록
+        # (라이브에서는 구간이 언제 끝날지 모르므로 False로 두고 세그먼트 단위 cue를 씀)
+        self.merge = merge
+        self.segments = {}  # 세그먼트 번호 → (시작, 끝) 초
+        self.runs = []      # [시작, 끝, 문구]
+
+    @staticmethod
+    def format_time(seconds):
+        total_ms = int(round(seconds * 1000))
+        s, ms = divmod(total_ms, 1000)
+        m, s = divmod(s, 60)
+        h, m = divmod(m, 60)
+        return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+    @staticmethod
+    def first_video_pts(ts_path, max_bytes=188 * 1024):
+        # .ts 앞부분에서 첫 비디오 PES의 PTS(90kHz)를 읽음
+        try:
+            with open(ts_path, "rb") as f:
+                data = f.read(max_bytes)
+        except OSError:
+            return None
+        for i in range(0, len(data) - 187, 188):
+            packet = data[i:i + 188]
+            if packet[0] != 0x47 or not packet[1] & 0x40:
+                continue
+            offset = 4
+            if packet[3] & 0x20:
+                offset += 1 + packet[4]
+            pes = packet[offset:]
+            if len(pes) >= 14 and pes[:3] == b"\x00\x00\x01" and 0xE0 <= pes[3] <= 0xEF and pes[7] & 0x80:
+                b = pes[9:14]
+                return ((b[0] >> 1) & 0x07) << 30 | b[1] << 22 | (b[2] >> 1) << 15 | b[3] << 7 | b[4] >> 1
+        return None
+
+    def add_cues(self, vtt_cues):
+        # vtt_cues: SemantPreprocessor.make_vtt_cue의 (세그먼트 번호, 시작, 끝, 문구) 목록 (세그먼트 순서대로)
+        for segment_index, start, end, text in vtt_cues:
+            self.segments[int(segment_index)] = (start, end)
+            if self.merge and self.runs and self.runs[-1][2] == text and abs(self.runs[-1][1] - start) < 0.0005:
+                self.runs[-1][1] = end
+            else:
+                self.runs.append([start, end, text])
+
+    def append(self, segment_index, ts_path=None, endlist=True):
+        # 자막 구간을 모르는 세그먼트(cue 없이 인코딩한 경우)는 건너뛰고 False 반환
+        if segment_index not in self.segments:
+            return False
+        start, end = self.segments.pop(segment_index)
+        # 조각은 세그먼트 순서대로 게시되므로 이미 끝난 cue는 다시 필요 없음
+        while self.runs and self.runs[0][1] <= start:
+            self.runs.pop(0)
+
+        mpegts = self.first_video_pts(ts_path) if ts_path is not None else None
+        if mpegts is None:
+            mpegts = self.DEFAULT_MPEGTS
+        lines = ["WEBVTT\n", f"X-TIMESTAMP-MAP=MPEGTS:{mpegts},LOCAL:{self.format_time(start)}\n", "\n"]
+        for run_start, run_end, text in self.runs:
+            if run_start >= end:
+                break
+            lines += [f"{self.format_time(run_start)} --> {self.format_time(run_end)}\n", text + "\n", "\n"]
+
+        fragment_name = f"{self.fragment_prefix}_{segment_index:04d}.vtt"
+        fragment_path = self.output_dir + "/" + fragment_name
+        with open(fragment_path + ".tmp", "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(fragment_path + ".tmp", fragment_path)
+
+        self.writer.append([f"#EXTINF:{end - start:.6f},\n", fragment_name + "\n"])
+        self.writer.publish(endlist=endlist)
+        print(f"[✔] Appended {fragment_name} → {self.writer.path}")
+        return True
+
+    def close(self):
+        if self.writer.entries:
+            self.writer.publish(endlist=True)
 
 
 class SemantEncoder ():
-    def __init__ (self, input_dir, output_dir_temp, output_dir, fps):
+    def __init__ (self, input_dir, output_dir_temp, output_dir, fps, playlist_window=None,
+                  cache_dir=None, cache_max_bytes=20 * 1024 ** 3, ladder_policy=None,
+                  encode_profile="default", part_duration=None, target_duration=1,
+                  lookahead_segments=1, segment_mode="fixed"):
         self.input_dir = input_dir
         self.output_dir_temp = output_dir_temp
         self.output_dir = output_dir
         self.framerate = fps
+        self.playlist_window = playlist_window  # None: 전체 유지, N: 라이브용 최근 N개 세그먼트만 유지
+        self.m3u8_writers = {}
+        # cache_dir를 주면 같은 프레임/파라미터의 세그먼트는 다시 인코딩하지 않음 (direct 모드)
+        self.encode_cache = EncodeCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+        # ladder_policy(LadderPolicy)를 주면 세그먼트의 risk에 따라 해상도별 bitrate/preset을 바꾸거나 건너뜀
+        self.ladder_policy = ladder_policy
+        self.ladder_gaps = {}
+        # encode_profile: ENCODE_PROFILES의 이름 또는 EncodeProfile (preset/tune/threads/rate control)
+        self.encode_profile = EncodeProfile.get(encode_profile)
+        self.manifest = None  # encoding(resume=...) 실행 중에만 설정되는 EncodeManifest
+        # part_duration(초, 예: 0.2)을 주면 LL-HLS: persistent 인코딩에서 세그먼트를 part로도 잘라 #EXT-X-PART로 게시
+        # (라이브에서는 닫히기 전 세그먼트의 part와 #EXT-X-PRELOAD-HINT도 게시, 다른 인코딩 경로에는 영향 없음)
+        # B-frame/lookahead가 있으면 muxer가 자르는 part 길이가 프레임마다 들쭉날쭉해져 (예: 5, 8, 4 프레임)
+        # #EXT-X-PART DURATION과 PART-TARGET이 맞지 않으므로 zerolatency 프로파일(예: "latency")에서만 허용
+        if part_duration and self.encode_profile.tune != "zerolatency":
+            raise ValueError(f"[!] part_duration requires a zerolatency encode profile (e.g. \"latency\"). "
+                             f"got={self.encode_profile.name}")
+        self.part_duration = part_duration
+        self.partial_segments = {}
+        # #EXT-X-TARGETDURATION (초, 정수): 세그먼트 길이가 일정하지 않으면(segment_mode="risk") 최대 세그먼트 길이로 올림
+        # 폴더 인코딩의 -hls_time도 이 값을 써서 세그먼트 폴더 하나가 .ts 하나로 나오게 함
+        self.target_duration = target_duration
+        # lookahead_segments > 1: NEXT-SEMANTICLEVEL과 함께 앞으로 N개 세그먼트의 level을 #EXT-X-SEMANTIC-FORECAST로 게시
+        if lookahead_segments < 1:
+            raise ValueError(f"[!] lookahead_segments must be >= 1. got={lookahead_segments}")
+        self.lookahead_segments = lookahead_segments
+        # 전처리의 세그먼트 경계 방식 (fixed/risk), encode manifest의 resume 설정 비교에만 사용
+        self.segment_mode = segment_mode
+        self.subtitle_writer = None
         
     def folder_init (self, path):
         if os.path.exists(path):
@@ -42,7 +848,7 @@ class SemantEncoder ():
         print(f"[✔] Inserted semantic tag: #EXT-X-PRIVACY:{bool_privacy} → {m3u8_path}")
 
         
-    def encode_per_folder(self, input_foler_path,risk_type, risk_level,privacy, index, segment_prefix = "720p", scale = "scale=1280:720", bitrate="2800", start_number=0):
+    def encode_per_folder(self, input_foler_path,risk_type, risk_level,privacy, index, segment_prefix = "720p", scale = "scale=1280:720", bitrate="2800", start_number=0, preset=None):
         input_pattern = input_foler_path+"/frame%04d.jpg"
         output_temp_path = self.output_dir_temp+'/temp_'+segment_prefix+'_'+privacy +'_'+str(index) 
         self.folder_init(output_temp_path)
@@ -57,10 +863,10 @@ class SemantEncoder ():
             "ffmpeg", "-framerate", str(self.framerate),
             "-start_number", str(start_number), "-i", input_pattern,
             "-vf", video_filters, "-r", str(self.framerate),
-            "-c:v", "libx264", "-b:v", bitrate,
-            "-preset", "fast", "-g", "30", "-keyint_min", "30",
+            *self.codec_args(bitrate, preset),
+            "-g", "30", "-keyint_min", "30",
             "-sc_threshold", "0", "-force_key_frames", "expr:gte(t,n_forced*1)",
-            "-hls_time", "1", "-hls_flags", "independent_segments+program_date_time",
+            "-hls_time", str(self.target_duration), "-hls_flags", "independent_segments+program_date_time",
             "-hls_playlist_type", "event", "-hls_segment_filename", segment_pattern,
             "-f", "hls", m3u8_path
         ]
@@ -77,14 +883,249 @@ class SemantEncoder ():
         
         return output_temp_path
     
-    def _generate_vtt_file(self, vtt_cues, filename="subtitles.vtt"):
-        """Writes the VTT cues to a file in the main output directory."""
-        vtt_path = Path(self.output_dir) / filename
-        with open(vtt_path, "w", encoding="utf-8") as f:
-            f.write("WEBVTT\n\n")
-            for cue in vtt_cues:
-                f.write(cue + "\n")
-        print(f"[✔] Generated subtitle file: {vtt_path}")
+    def encode_multi_per_folder(self, input_foler_path, risk_type, risk_level, privacy, index, encoding_list, start_number=0, preset=None):
+        # 한 번의 디코딩으로 encoding_list의 모든 해상도를 생성 (split + scale, var_stream_map)
+        input_pattern = input_foler_path+"/frame%04d.jpg"
+        output_temp_path = self.output_dir_temp+'/temp_multi_'+privacy +'_'+str(index)
+        self.folder_init(output_temp_path)
+
+        m3u8_pattern = output_temp_path + "/%v.m3u8"
+        segment_pattern = output_temp_path + "/%v_%04d.ts"
+
+        n_outputs = len(encoding_list)
+        split_labels = "".join(f"[s{k}]" for k in range(n_outputs))
+        filter_graph = [f"[0:v]setpts=PTS-STARTPTS,split={n_outputs}{split_labels}"]
+        for k, (segment_prefix, scale, bitrate) in enumerate(encoding_list):
+            filter_graph.append(f"[s{k}]{scale}[v{k}]")
+
+        cmd = [
+            "ffmpeg",
+            "-framerate", str(self.framerate),
+            "-start_number", str(start_number),
+            "-i", input_pattern,
+            "-filter_complex", ";".join(filter_graph),
+        ]
+        for k in range(n_outputs):
+            cmd += ["-map", f"[v{k}]"]
+        cmd += [
+            "-r", str(self.framerate),
+            "-c:v", "libx264",
+        ]
+        for k, (segment_prefix, scale, bitrate) in enumerate(encoding_list):
+            cmd += self.encode_profile.rate_args(bitrate, f":{k}")
+        cmd += self.encode_profile.tuning_args(preset)
+        cmd += [
+            "-g", "30",
+            "-keyint_min", "30",
+            "-sc_threshold", "0",
+            "-force_key_frames", "expr:gte(t,n_forced*1)",
+            "-hls_time", str(self.target_duration),
+            "-hls_flags", "independent_segments+program_date_time",
+            "-hls_playlist_type", "event",
+            "-hls_segment_filename", segment_pattern,
+            "-var_stream_map", " ".join(f"v:{k},name:{prefix}" for k, (prefix, _, _) in enumerate(encoding_list)),
+            "-f", "hls",
+            m3u8_pattern
+        ]
+        print(f"[▶] Running FFmpeg (single pass, {n_outputs} renditions) : {' '.join(cmd)}")
+        subprocess.run(cmd, check=True)
+        print(f"[✔] HLS encoded: {m3u8_pattern}")
+
+        if privacy == 'blur': 
+            bool_privacy = 1
+        else:
+            bool_privacy = 0
+
+        for segment_prefix, _, _ in encoding_list:
+            m3u8_path = output_temp_path + "/" + f"{segment_prefix}.m3u8"
+            self.add_semantic_tag_to_m3u8(m3u8_path, risk_type, risk_level, bool_privacy=bool_privacy)
+
+        return output_temp_path
+    
+    def encode_direct_per_folder(self, input_foler_path, privacy, index, encoding_list, start_number=0, preset=None):
+        # temp 폴더와 임시 m3u8 없이 각 해상도의 .ts를 output_dir에 최종 이름으로 바로 인코딩
+        # (encoding_list가 여러 개면 한 번의 디코딩에서 split 하여 모두 출력,
+        #  encode_cache에 같은 프레임/파라미터의 결과가 있으면 인코딩 없이 재사용)
+        input_pattern = input_foler_path+"/frame%04d.jpg"
+        n_frames = len([name for name in os.listdir(input_foler_path) if name.startswith("frame")])
+        duration = n_frames / self.framerate
+        suffix = "_privacy" if privacy == "blur" else ""
+
+        frames_digest = None
+        if self.encode_cache is not None:
+            frames_digest = self.encode_cache.hash_frames(input_foler_path)
+
+        outputs = []
+        segments = []
+        for segment_prefix, scale, bitrate in encoding_list:
+            ts_path = self.output_dir + "/" + f"{segment_prefix}_{int(index):04d}{suffix}.ts"
+            output_args = self.direct_output_args(bitrate, preset)
+            segments.append((segment_prefix, None, duration))
+            cache_key = None
+            if frames_digest is not None:
+                cache_key = self.encode_cache.make_key(frames_digest, [scale] + output_args)
+                if self.encode_cache.fetch(cache_key, ts_path):
+                    print(f"[✔] Encode cache hit: {ts_path}")
+                    continue
+            outputs.append((scale, output_args, ts_path, cache_key))
+
+        if outputs:
+            n_outputs = len(outputs)
+            split_labels = "".join(f"[s{k}]" for k in range(n_outputs))
+            filter_graph = [f"[0:v]setpts=PTS-STARTPTS,split={n_outputs}{split_labels}"]
+            for k, (scale, _, _, _) in enumerate(outputs):
+                filter_graph.append(f"[s{k}]{scale}[v{k}]")
+
+            cmd = [
+                "ffmpeg", "-y",
+                "-framerate", str(self.framerate),
+                "-start_number", str(start_number),
+                "-i", input_pattern,
+                "-filter_complex", ";".join(filter_graph),
+            ]
+            for k, (_, output_args, ts_path, _) in enumerate(outputs):
+                cmd += ["-map", f"[v{k}]"] + output_args + [ts_path]
+            print(f"[▶] Running FFmpeg (direct, {n_outputs} renditions) : {' '.join(cmd)}")
+            subprocess.run(cmd, check=True)
+            print(f"[✔] Segment encoded: {input_foler_path} ({duration:.3f}s)")
+
+            for _, _, ts_path, cache_key in outputs:
+                if cache_key is not None:
+                    self.encode_cache.store(cache_key, ts_path)
+        return segments
+
+    def init_subtitles(self, vtt_cues=None, merge=True, playlist_name="subtitles.m3u8"):
+        # 세그먼트별 WebVTT 조각과 자막 playlist를 준비하고 master에 넣을 playlist 이름을 반환
+        # (조각은 commit_segment에서 비디오 세그먼트가 게시될 때 함께 게시됨)
+        self.subtitle_writer = VttPlaylistWriter(self.output_dir, playlist_name, window=self.playlist_window,
+                                                 target_duration=self.target_duration, merge=merge)
+        if vtt_cues:
+            self.subtitle_writer.add_cues(vtt_cues)
+        self.subtitle_writer.writer.publish(endlist=False)
+        return playlist_name
+
+    def codec_args(self, bitrate, preset=None):
+        # -c:v 부터 encode_profile의 rate control / preset / tune 등 (preset을 주면 프로파일 preset 대신 사용)
+        return ["-c:v", "libx264"] + self.encode_profile.rate_args(bitrate) + self.encode_profile.tuning_args(preset)
+
+    def direct_output_args(self, bitrate, preset=None, muxer="mpegts", force_key_frames="expr:gte(t,n_forced*1)"):
+        # direct/raw/persistent 모드에서 해상도별 출력에 공통으로 붙는 인코딩 옵션
+        return [
+            "-r", str(self.framerate),
+            *self.codec_args(bitrate, preset),
+            "-g", "30",
+            "-keyint_min", "30",
+            "-sc_threshold", "0",
+            "-force_key_frames", force_key_frames,
+            "-f", muxer,
+        ]
+
+    def encode_raw_segment(self, folder_name, frames, width, height, encoding_list, pix_fmt="yuv420p"):
+        # 세그먼트 폴더 없이 raw 프레임(frames: bytes-like 반복자)을 ffmpeg stdin으로 흘려 .ts를 output_dir에 직접 출력
+        # (캡처/분석 단계에서 받은 raw 프레임을 그대로 넘기는 입구로도 사용)
+        risk_level = folder_name.split("_")[-1]
+        risk_type = folder_name.split("_")[-2]
+        privacy = folder_name.split("_")[-3]
+        file_index =  folder_name.split("_")[-4]
+        bool_privacy = privacy == "blur"
+        suffix = "_privacy" if bool_privacy else ""
+
+        preset = None
+        skipped = []
+        if self.ladder_policy is not None:
+            encoding_list, skipped, preset = self.ladder_policy.plan(encoding_list, risk_type, risk_level, bool_privacy)
+
+        n_outputs = len(encoding_list)
+        split_labels = "".join(f"[s{k}]" for k in range(n_outputs))
+        filter_graph = [f"[0:v]setpts=PTS-STARTPTS,split={n_outputs}{split_labels}"]
+        filter_graph += [f"[s{k}]{scale}[v{k}]" for k, (_, scale, _) in enumerate(encoding_list)]
+
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", pix_fmt, "-s", f"{width}x{height}",
+            "-framerate", str(self.framerate), "-i", "-",
+            "-filter_complex", ";".join(filter_graph),
+        ]
+        for k, (segment_prefix, _, bitrate) in enumerate(encoding_list):
+            ts_path = self.output_dir + "/" + f"{segment_prefix}_{int(file_index):04d}{suffix}.ts"
+            cmd += ["-map", f"[v{k}]"] + self.direct_output_args(bitrate, preset) + [ts_path]
+
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        n_frames = 0
+        try:
+            for frame in frames:
+                proc.stdin.write(frame)  # 인코더가 밀리면 파이프가 차서 여기서 대기
+                n_frames += 1
+        finally:
+            proc.stdin.close()
+            returncode = proc.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+        duration = n_frames / self.framerate
+        if skipped:
+            self.ladder_gaps[folder_name] = [(segment_prefix, duration) for segment_prefix in skipped]
+        print(f"[✔] Segment encoded from raw pipe: {folder_name} ({n_frames} frames, {duration:.3f}s)")
+        return [(segment_prefix, None, duration) for segment_prefix, _, _ in encoding_list]
+
+    def encoding_raw(self, segments, vtt_cues,
+                     encoding_list=[("1080p","scale=1920:1080", "5000k" ),
+                                      ("480p","scale=854:480",   "1400k" ),
+                                      ("144p","scale=256:144",   "250k" )],
+                     pix_fmt="yuv420p"):
+        # segments: SemantPreprocessor.plan_segments의 [(folder_name, [프레임 경로 또는 memoryview])]
+        # 세그먼트 프레임 폴더를 만들지 않고, 모든 JPEG을 디코더 하나로 한 번만 디코딩하여
+        # 세그먼트별 인코더에 raw 프레임으로 전달
+        self.folder_init(self.output_dir)
+        subtitle_filename = self.init_subtitles(vtt_cues)
+        if self.ladder_policy is not None:
+            self.create_init_m3u8(self.ladder_policy.playlist_info(encoding_list), subtitle_path=subtitle_filename)
+        else:
+            self.create_init_m3u8(subtitle_path=subtitle_filename)
+        if not segments:
+            return None
+
+        folder_names = [folder_name for folder_name, _ in segments]
+        reader = RawFrameReader([path for _, paths in segments for path in paths], pix_fmt=pix_fmt)
+        file_index = None
+        try:
+            for i, (folder_name, paths) in enumerate(segments):
+                encoded = self.encode_raw_segment(folder_name, reader.frames(len(paths)), reader.width, reader.height,
+                                                  encoding_list, pix_fmt=pix_fmt)
+                next_risk_level = self.next_risk_level(folder_names, i)
+                file_index = self.commit_segment(folder_name, encoded, next_risk_level)
+        finally:
+            reader.close()
+        return file_index
+
+    def encoding_persistent(self, segments, vtt_cues,
+                            encoding_list=[("1080p","scale=1920:1080", "5000k" ),
+                                             ("480p","scale=854:480",   "1400k" ),
+                                             ("144p","scale=256:144",   "250k" )],
+                            preset=None):
+        # segments: SemantPreprocessor.plan_segments의 [(folder_name, [프레임 경로 또는 memoryview])]
+        # 세그먼트마다 ffmpeg를 새로 띄우지 않고 스트림 전체에서 인코더 하나를 유지 (PersistentSegmenter)
+        # ladder_policy / encode_cache는 세그먼트별 인코딩에서만 적용됨
+        self.folder_init(self.output_dir)
+        subtitle_filename = self.init_subtitles(vtt_cues)
+        if self.ladder_policy is not None:
+            self.create_init_m3u8(self.ladder_policy.playlist_info(encoding_list), subtitle_path=subtitle_filename)
+        else:
+            self.create_init_m3u8(subtitle_path=subtitle_filename)
+        if not segments:
+            return None
+
+        segmenter = PersistentSegmenter(self, encoding_list, preset=preset,
+                                        segment_lengths=[len(paths) for _, paths in segments],
+                                        segment_names=[folder_name for folder_name, _ in segments])
+        try:
+            for folder_name, paths in segments:
+                segmenter.feed(folder_name, paths)
+            segmenter.close()
+        finally:
+            if segmenter.proc is not None and segmenter.proc.poll() is None:
+                segmenter.proc.kill()
+        return segments[-1][0].split("_")[-4]
 
     def create_init_m3u8(self, 
                           playlist_info = [("1080p", "1920x1080", 5000000, False),
@@ -93,6 +1134,7 @@ class SemantEncoder ():
                           subtitle_path=None):
         output_dir = Path(self.output_dir)
         master_path = output_dir / "master.m3u8"
+        self.m3u8_writers = {}
 
         lines = ["#EXTM3U", "#EXT-X-VERSION:3\n"]
         
@@ -118,7 +1160,15 @@ class SemantEncoder ():
 
         print(f"[✔] Created master.m3u8 and resoultion.m3u8 files at {master_path}")
         
-    def update_ts_m3u8(self, temp_folder_path,  file_index, segment_prefix="1080p", privacy = False, next_risk_level=None):
+    def get_m3u8_writer(self, output_m3u8_path):
+        if self.subtitle_writer is not None and output_m3u8_path == self.subtitle_writer.writer.path:
+            return self.subtitle_writer.writer
+        if output_m3u8_path not in self.m3u8_writers:
+            self.m3u8_writers[output_m3u8_path] = M3u8Writer(output_m3u8_path, window=self.playlist_window,
+                                                             part_window=3 if self.part_duration else None)
+        return self.m3u8_writers[output_m3u8_path]
+
+    def update_ts_m3u8(self, temp_folder_path,  file_index, segment_prefix="1080p", privacy = False, next_risk_level=None, endlist=True):
         src =temp_folder_path + "/"+f"{segment_prefix}_0000.ts"
         ts_index = temp_folder_path.split("_")[-1]
 
@@ -135,9 +1185,9 @@ class SemantEncoder ():
         else:
             output_m3u8_path = self.output_dir+"/"+ f"{segment_prefix}.m3u8"
         
-        if int(ts_index) == 1:
-            shutil.copyfile(m3u8_path, output_m3u8_path)
-            with open(output_m3u8_path, "r") as f:
+        writer = self.get_m3u8_writer(output_m3u8_path)
+        if not writer.header:
+            with open(m3u8_path, "r") as f:
                 lines = f.readlines()
             original_name = f"{segment_prefix}_{int(0):04d}.ts"
             if privacy:
@@ -149,20 +1199,23 @@ class SemantEncoder ():
                 line.replace(original_name, privacy_name)
                 for line in lines
             ]
+            # ffmpeg는 첫 세그먼트 길이로 TARGETDURATION을 쓰므로 이후 더 긴 세그먼트까지 덮도록 교체
+            updated_lines = [f"#EXT-X-TARGETDURATION:{self.target_duration}\n"
+                             if line.startswith("#EXT-X-TARGETDURATION:") else line for line in updated_lines]
             
             if next_risk_level is not None:
                 for i, line in enumerate(updated_lines):
                     if line.startswith("#EXT-X-SEMANTICLEVEL:"):
-                        updated_lines.insert(i + 1, f"#EXT-X-NEXT-SEMANTICLEVEL:{int(next_risk_level)}\n")
+                        updated_lines[i + 1:i + 1] = self.make_lookahead_lines(next_risk_level)
                         break
                     
-            with open(output_m3u8_path, "w") as f:
-                f.writelines(updated_lines)
+            writer.start(updated_lines)
+            writer.publish(endlist=endlist)
 
         else:
-            self.append_m3u8_file(m3u8_path, output_m3u8_path,segment_prefix, ts_index, privacy = privacy, next_risk_level=next_risk_level)
+            self.append_m3u8_file(m3u8_path, output_m3u8_path,segment_prefix, ts_index, privacy = privacy, next_risk_level=next_risk_level, endlist=endlist)
     
-    def append_m3u8_file(self, m3u8_path, output_m3u8_path, segment_prefix, ts_index, privacy=False, next_risk_level=None):
+    def append_m3u8_file(self, m3u8_path, output_m3u8_path, segment_prefix, ts_index, privacy=False, next_risk_level=None, endlist=True):
         output_lines = [] 
         
         with open(m3u8_path, "r") as f:
@@ -181,54 +1234,379 @@ class SemantEncoder ():
                         ts_line = f"{segment_prefix}_{int(ts_index):04d}.ts\n"
 
                     output_lines = [risk_type_line, risk_level_line, privacy_line]
-                    if next_risk_level is not None:
-                        output_lines.append(f"#EXT-X-NEXT-SEMANTICLEVEL:{int(next_risk_level)}\n")
+                    output_lines += self.make_lookahead_lines(next_risk_level)
                     output_lines += [extinf_line, ts_line]
 
-        with open(output_m3u8_path, "r") as f:
-            existing = f.readlines()
-        if existing and existing[-1].strip() == "#EXT-X-ENDLIST":
-            existing = existing[:-1]
-        with open(output_m3u8_path, "w") as f:
-            f.writelines(existing + output_lines)
-            f.write("#EXT-X-ENDLIST\n")
+        writer = self.get_m3u8_writer(output_m3u8_path)
+        writer.append(output_lines)
+        writer.publish(endlist=endlist)
 
         print(f"[✔] Appended {m3u8_path} → {output_m3u8_path} with NEXT-SEMANTICLEVEL:{next_risk_level}")
 
+    def make_m3u8_header(self, target_duration=None):
+        if target_duration is None:
+            target_duration = self.target_duration
+        lines = ["#EXTM3U\n", "#EXT-X-VERSION:6\n", f"#EXT-X-TARGETDURATION:{target_duration}\n",
+                 "#EXT-X-MEDIA-SEQUENCE:0\n", "#EXT-X-PLAYLIST-TYPE:EVENT\n", "#EXT-X-INDEPENDENT-SEGMENTS\n"]
+        if self.part_duration:
+            # LL-HLS: PART-TARGET은 프레임 단위로 맞춘 part 길이, PART-HOLD-BACK은 권장값인 PART-TARGET의 3배
+            part_target = max(1, round(self.part_duration * self.framerate)) / self.framerate
+            lines += [f"#EXT-X-SERVER-CONTROL:PART-HOLD-BACK={3 * part_target:.3f}\n",
+                      f"#EXT-X-PART-INF:PART-TARGET={part_target:.6f}\n"]
+        return lines
+
+    def make_semantic_tags(self, risk_type, risk_level, bool_privacy, next_risk_level=None):
+        lines = [f"#EXT-X-SEMANTICTYPE:{int(risk_type)}\n",
+                 f"#EXT-X-SEMANTICLEVEL:{int(risk_level)}\n",
+                 f"#EXT-X-PRIVACY:{int(bool_privacy)}\n"]
+        lines += self.make_lookahead_lines(next_risk_level)
+        return lines
+
+    def make_lookahead_lines(self, next_risk_level):
+        # next_risk_level: 다음 세그먼트 level, 또는 lookahead_segments > 1이면 앞으로 최대 N개 세그먼트의 level 목록
+        # 목록이면 NEXT-SEMANTICLEVEL(첫 값)에 더해 #EXT-X-SEMANTIC-FORECAST:<level>,<level>,... (가까운 순)을 씀
+        if next_risk_level is None:
+            return []
+        if not isinstance(next_risk_level, (list, tuple)):
+            return [f"#EXT-X-NEXT-SEMANTICLEVEL:{int(next_risk_level)}\n"]
+        return [f"#EXT-X-NEXT-SEMANTICLEVEL:{int(next_risk_level[0])}\n",
+                "#EXT-X-SEMANTIC-FORECAST:" + ",".join(str(int(level)) for level in next_risk_level) + "\n"]
+
+    def make_part_lines(self, parts):
+        # parts: [(part URI, 길이)] (세그먼트의 첫 part만 키프레임으로 시작)
+        return [f'#EXT-X-PART:DURATION={duration:.6f},URI="{uri}"' + (",INDEPENDENT=YES" if j == 0 else "") + "\n"
+                for j, (uri, duration) in enumerate(parts)]
+
+    def make_m3u8_entry(self, ts_name, duration, risk_type, risk_level, bool_privacy,
+                        next_risk_level=None, program_date_time=None, gap=False, parts=()):
+        lines = self.make_semantic_tags(risk_type, risk_level, bool_privacy, next_risk_level)
+        if gap:
+            lines.append("#EXT-X-GAP\n")
+        lines += self.make_part_lines(parts)
+        lines.append(f"#EXTINF:{duration:.6f},\n")
+        if program_date_time is not None:
+            lines.append(f"#EXT-X-PROGRAM-DATE-TIME:{program_date_time}\n")
+        lines.append(ts_name + "\n")
+        return lines
+
+    def append_m3u8_entry(self, folder_name, segment_prefix, duration, next_risk_level=None, endlist=True, gap=False,
+                          parts=()):
+        # 폴더 이름의 메타데이터와 알려진 길이로 m3u8 항목을 직접 만들어 이어붙임 (임시 m3u8 파싱 없음)
+        risk_level = folder_name.split("_")[-1]
+        risk_type = folder_name.split("_")[-2]
+        privacy = folder_name.split("_")[-3]
+        file_index =  folder_name.split("_")[-4]
+        bool_privacy = privacy == "blur"
+
+        if bool_privacy:
+            ts_name = f"{segment_prefix}_{int(file_index):04d}_privacy.ts"
+            output_m3u8_path = self.output_dir+"/"+ f"{segment_prefix}_privacy.m3u8"
+        else:
+            ts_name = f"{segment_prefix}_{int(file_index):04d}.ts"
+            output_m3u8_path = self.output_dir+"/"+ f"{segment_prefix}.m3u8"
+
+        writer = self.get_m3u8_writer(output_m3u8_path)
+        if not writer.entries:
+            program_date_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "+0000"
+            writer.start(self.make_m3u8_header() + self.make_m3u8_entry(
+                ts_name, duration, risk_type, risk_level, bool_privacy, next_risk_level, program_date_time, gap,
+                parts))
+        else:
+            writer.append(["\n"] + self.make_m3u8_entry(
+                ts_name, duration, risk_type, risk_level, bool_privacy, next_risk_level, gap=gap, parts=parts))
+        writer.publish(endlist=endlist)
+        print(f"[✔] Appended {ts_name} → {output_m3u8_path} with NEXT-SEMANTICLEVEL:{next_risk_level}")
+
+    def publish_partial_segment(self, folder_name, segment_prefix, parts, preload_uri=None):
+        # LL-HLS: 아직 닫히지 않은 세그먼트의 SEMANTIC 태그, 지금까지 닫힌 part, 다음 part의 PRELOAD-HINT를
+        # m3u8 끝에 게시 (부모 세그먼트가 닫혀 append_m3u8_entry로 게시되면 이 부분은 대체됨)
+        risk_level = folder_name.split("_")[-1]
+        risk_type = folder_name.split("_")[-2]
+        privacy = folder_name.split("_")[-3]
+        bool_privacy = privacy == "blur"
+
+        if bool_privacy:
+            output_m3u8_path = self.output_dir+"/"+ f"{segment_prefix}_privacy.m3u8"
+        else:
+            output_m3u8_path = self.output_dir+"/"+ f"{segment_prefix}.m3u8"
+
+        writer = self.get_m3u8_writer(output_m3u8_path)
+        if not writer.header:
+            writer.start(self.make_m3u8_header())
+        tail = ["\n"] if writer.entries else []
+        tail += self.make_semantic_tags(risk_type, risk_level, bool_privacy)
+        tail += self.make_part_lines(parts)
+        if preload_uri is not None:
+            tail.append(f'#EXT-X-PRELOAD-HINT:TYPE=PART,URI="{preload_uri}"\n')
+        writer.tail = tail
+        writer.publish(endlist=False)
+
+    def encode_segment(self, folder_name, encoding_list, single_pass=False, direct=False):
+        # 세그먼트 하나를 모든 해상도로 인코딩하고 (segment_prefix, temp_folder_path, duration) 목록을 반환
+        # direct 모드에서는 .ts가 이미 output_dir에 있으므로 temp_folder_path는 None
+        risk_level = folder_name.split("_")[-1]
+        risk_type = folder_name.split("_")[-2]
+        privacy = folder_name.split("_")[-3]
+        file_index =  folder_name.split("_")[-4]
+
+        input_foler_path = self.input_dir + "/" + folder_name
+
+        preset = None
+        if self.ladder_policy is not None:
+            encoding_list, skipped, preset = self.ladder_policy.plan(encoding_list, risk_type, risk_level, privacy == "blur")
+            if skipped:
+                n_frames = len([name for name in os.listdir(input_foler_path) if name.startswith("frame")])
+                self.ladder_gaps[folder_name] = [(segment_prefix, n_frames / self.framerate) for segment_prefix in skipped]
+
+        if direct:
+            if single_pass:
+                return self.encode_direct_per_folder(input_foler_path, privacy, file_index, encoding_list, preset=preset)
+            segments = []
+            for rendition in encoding_list:
+                segments += self.encode_direct_per_folder(input_foler_path, privacy, file_index, [rendition], preset=preset)
+            return segments
+
+        if single_pass:
+            temp_folder_path = self.encode_multi_per_folder(
+                input_foler_path, risk_type, risk_level, privacy, file_index,
+                encoding_list, start_number=0, preset=preset
+            )
+            return [(segment_prefix, temp_folder_path, None) for segment_prefix, _, _ in encoding_list]
+
+        temp_folders = []
+        for segment_prefix, scale, bitrate in encoding_list:
+            temp_folder_path = self.encode_per_folder(
+                input_foler_path, risk_type, risk_level, privacy, file_index,
+                segment_prefix=segment_prefix, scale=scale, bitrate=bitrate, start_number=0, preset=preset
+            )
+            temp_folders.append((segment_prefix, temp_folder_path, None))
+        return temp_folders
+
+    def profile_sweep(self, folder_names, encoding_list, profiles=None, single_pass=True, measure_quality=True):
+        # 샘플 구간(folder_names)을 encode_profile마다 output_dir/profile_sweep/<이름>에 direct 모드로 인코딩하여
+        # 프로파일별 인코딩 속도(fps, 실시간 배수)와 크기(kbps), 해상도별 평균 PSNR(measure_quality)을 비교
+        # (realtime_x는 이 프로세스 하나 기준 → 장비당 카메라 수는 코어 수와 프로파일의 threads를 함께 고려)
+        n_frames = sum(len([name for name in os.listdir(self.input_dir + "/" + folder_name) if name.startswith("frame")])
+                       for folder_name in folder_names)
+        duration = n_frames / self.framerate
+        results = []
+        for profile in profiles or list(ENCODE_PROFILES):
+            profile = EncodeProfile.get(profile)
+            sweep_dir = self.output_dir + "/profile_sweep/" + profile.name
+            encoder = SemantEncoder(self.input_dir, sweep_dir + "/temp", sweep_dir, self.framerate, encode_profile=profile)
+            encoder.folder_init(sweep_dir)
+
+            t = time.time()
+            for folder_name in folder_names:
+                encoder.encode_segment(folder_name, encoding_list, single_pass=single_pass, direct=True)
+            elapsed = time.time() - t
+
+            sizes = {segment_prefix: 0 for segment_prefix, _, _ in encoding_list}
+            psnr = {segment_prefix: [] for segment_prefix, _, _ in encoding_list}
+            for folder_name in folder_names:
+                suffix = "_privacy" if folder_name.split("_")[-3] == "blur" else ""
+                file_index = folder_name.split("_")[-4]
+                for segment_prefix, scale, _ in encoding_list:
+                    ts_path = sweep_dir + "/" + f"{segment_prefix}_{int(file_index):04d}{suffix}.ts"
+                    sizes[segment_prefix] += os.path.getsize(ts_path)
+                    if measure_quality:
+                        psnr[segment_prefix].append(self.measure_psnr(ts_path, self.input_dir + "/" + folder_name, scale))
+
+            result = {
+                "profile": profile.name,
+                "wall_s": round(elapsed, 3),
+                "fps": round(n_frames / elapsed, 1),
+                "realtime_x": round(duration / elapsed, 2),
+                "bytes": sum(sizes.values()),
+                "kbps": {segment_prefix: round(size * 8 / duration / 1000, 1) for segment_prefix, size in sizes.items()},
+            }
+            if measure_quality:
+                result["psnr"] = {segment_prefix: round(sum(values) / len(values), 2)
+                                  for segment_prefix, values in psnr.items() if values}
+            results.append(result)
+            print(f"[✔] Profile {profile.name:10s} {result['fps']:8.1f} fps ({result['realtime_x']:.2f}x realtime) "
+                  f"{result['bytes']:>10d} B  kbps {result['kbps']}" + (f"  PSNR {result['psnr']}" if measure_quality else ""))
+        return results
+
+    def measure_psnr(self, ts_path, input_foler_path, scale):
+        # 인코딩된 .ts와 (같은 scale로 맞춘) 원본 프레임의 평균 PSNR (dB)
+        filter_graph = [f"[0:v]{scale},settb=AVTB,setpts=PTS-STARTPTS[ref]",
+                        "[1:v]settb=AVTB,setpts=PTS-STARTPTS[dist]", "[dist][ref]psnr"]
+        cmd = [
+            "ffmpeg", "-nostats", "-loglevel", "info",
+            "-framerate", str(self.framerate), "-start_number", "0", "-i", input_foler_path + "/frame%04d.jpg",
+            "-i", ts_path,
+            "-lavfi", ";".join(filter_graph),
+            "-f", "null", "-"
+        ]
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+        match = re.search(r"PSNR .*average:(\S+)", proc.stderr)
+        if match is None:
+            raise ValueError(f"[!] Could not read PSNR for {ts_path}")
+        return float(match.group(1))
+
     def encoding (self, folder_names, vtt_cues, 
                   encoding_list = [("1080p","scale=1920:1080", "5000k" ),
                                    ("480p","scale=854:480",   "1400k" ),
-                                   ("144p","scale=256:144",   "250k" )]):
+                                   ("144p","scale=256:144",   "250k" )],
+                  single_pass=False, workers=1, direct=False, resume=False):
+        # resume=True: output_dir을 지우지 않고 encode_manifest.jsonl에 기록된 세그먼트는 m3u8만 복원한 뒤 이어서 인코딩
+        if self.encode_cache is not None and not direct:
+            print("[i] Encode cache reuses final .ts outputs, switching to direct mode.")
+            direct = True
         start_number = 1
         
-        self.folder_init(self.output_dir_temp)
-        self.folder_init(self.output_dir)
+        if not direct:
+            self.folder_init(self.output_dir_temp)
+        if resume:
+            Path(self.output_dir).mkdir(parents=True, exist_ok=True)
+        else:
+            self.folder_init(self.output_dir)
+
+        subtitle_filename = self.init_subtitles(vtt_cues)
+        if self.ladder_policy is not None:
+            self.create_init_m3u8(self.ladder_policy.playlist_info(encoding_list), subtitle_path=subtitle_filename)
+        else:
+            self.create_init_m3u8(subtitle_path=subtitle_filename)
+
+        # 인코딩은 workers 개의 스레드(각각 ffmpeg 프로세스 구동)로 병렬 처리하고,
+        # m3u8 갱신은 현재 스레드에서 세그먼트 순서대로만 수행 (동시 대기 작업 수는 workers*2로 제한)
+        max_pending = max(1, workers) * 2
+        pending = deque()
+        file_index = None
+
+        self.manifest = EncodeManifest(self.output_dir + "/encode_manifest.jsonl", encoding_list,
+                                       self.manifest_settings())
+        committed = self.resume_from_manifest(folder_names) if resume else 0
+        if committed == 0:
+            self.manifest.start()
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            try:
+                for folder_name in folder_names[committed:]:
+                    pending.append(executor.submit(self.encode_segment, folder_name, encoding_list, single_pass, direct))
+                    if len(pending) >= max_pending:
+                        file_index = self.commit_segment(folder_names[committed], pending.popleft().result(),
+                                                         self.next_risk_level(folder_names, committed))
+                        committed += 1
+                while pending:
+                    file_index = self.commit_segment(folder_names[committed], pending.popleft().result(),
+                                                     self.next_risk_level(folder_names, committed))
+                    committed += 1
+            except Exception:
+                for future in pending:
+                    future.cancel()
+                raise
+            finally:
+                self.manifest = None
+        return file_index
+
+    def next_risk_level(self, folder_names, i):
+        return self.semantic_lookahead(folder_name.split("_")[-1]
+                                       for folder_name in folder_names[i + 1:i + 1 + self.lookahead_segments])
+
+    def semantic_lookahead(self, levels):
+        # 가까운 순서의 다음 세그먼트 level들 → commit_segment의 next_risk_level
+        # (lookahead_segments == 1이면 다음 level 하나, 아니면 최대 lookahead_segments개 목록, 모르면 None)
+        levels = list(levels)[:self.lookahead_segments]
+        if not levels:
+            return None
+        return levels[0] if self.lookahead_segments == 1 else levels
+
+    def manifest_settings(self):
+        # encode manifest에 함께 기록하는 설정 (resume 시 이 중 하나라도 바뀌면 이전 세그먼트를 이어 쓰지 않음)
+        ladder = None
+        if self.ladder_policy is not None:
+            ladder = {"rules": self.ladder_policy.rules, "default_preset": self.ladder_policy.default_preset}
+        return {
+            "encode_profile": vars(self.encode_profile),
+            "ladder_policy": ladder,
+            "framerate": self.framerate,
+            "target_duration": self.target_duration,
+            "segment_mode": self.segment_mode,
+            "lookahead_segments": self.lookahead_segments,
+        }
 
-        subtitle_filename = "subtitles.vtt"
-        self._generate_vtt_file(vtt_cues, subtitle_filename)
-        self.create_init_m3u8(subtitle_path=subtitle_filename)
-
-        for i, folder_name in enumerate(folder_names):
-            risk_level = folder_name.split("_")[-1]
-            risk_type = folder_name.split("_")[-2]
-            privacy = folder_name.split("_")[-3]
-            file_index =  folder_name.split("_")[-4]
-            bool_privacy = False
-            if privacy == "blur":
-                bool_privacy = True
-
-            next_risk_level = None
-            if i + 1 < len(folder_names):
-                next_folder = folder_names[i + 1]
-                next_risk_level = next_folder.split("_")[-1]
-
-            input_foler_path = self.input_dir + "/" + folder_name
-
-            for segment_prefix, scale, bitrate in encoding_list:
-                temp_folder_path = self.encode_per_folder(
-                    input_foler_path, risk_type, risk_level, privacy, file_index,
-                    segment_prefix=segment_prefix, scale=scale, bitrate=bitrate, start_number=0
-                )
-                self.update_ts_m3u8(temp_folder_path, file_index, segment_prefix=segment_prefix,
-                                    privacy=bool_privacy, next_risk_level=next_risk_level)
-        return file_index
\ No newline at end of file
+    def resume_from_manifest(self, folder_names):
+        # manifest 기록 중 folder_names 순서와 일치하고 출력 파일이 온전한 앞부분만 남겨 m3u8을 그대로 복원하고,
+        # 이어서 인코딩할 위치(이미 게시된 세그먼트 수)를 반환
+        valid = []
+        for record in self.manifest.load():
+            if len(valid) >= len(folder_names) or record["folder"] != folder_names[len(valid)]:
+                break
+            if not self.manifest.media_ok(record):
+                print(f"[!] Output of {record['folder']} is missing or incomplete, re-encoding from there.")
+                break
+            valid.append(record)
+
+        headers = {}
+        writers = {}
+        for record in valid:
+            headers.update(record.get("headers", {}))
+            for name, entry_lines in record["playlists"].items():
+                writer = self.get_m3u8_writer(self.output_dir + "/" + name)
+                if not writer.header:
+                    writer.header = headers[name]
+                writer.append(entry_lines)
+                writers[name] = writer
+        for writer in writers.values():
+            writer.publish(endlist=True)
+
+        self.manifest.start(valid)
+        if valid:
+            print(f"[i] Resuming after {len(valid)} committed segments (last: {valid[-1]['folder']})")
+        return len(valid)
+
+    def commit_segment(self, folder_name, temp_folders, next_risk_level=None, endlist=True):
+        privacy = folder_name.split("_")[-3]
+        file_index =  folder_name.split("_")[-4]
+        bool_privacy = False
+        if privacy == "blur":
+            bool_privacy = True
+
+        # LL-HLS(PersistentSegmenter)에서 닫힌 part 목록 (해상도별)
+        partial_segments = self.partial_segments.pop(folder_name, {})
+        for segment_prefix, temp_folder_path, duration in temp_folders:
+            if temp_folder_path is None:
+                self.append_m3u8_entry(folder_name, segment_prefix, duration,
+                                       next_risk_level=next_risk_level, endlist=endlist,
+                                       parts=partial_segments.get(segment_prefix, ()))
+                continue
+            self.update_ts_m3u8(temp_folder_path, file_index, segment_prefix=segment_prefix,
+                                privacy=bool_privacy, next_risk_level=next_risk_level, endlist=endlist)
+
+        # ladder_policy로 건너뛴 해상도는 GAP 항목으로 채워 다른 해상도와 세그먼트 순서를 맞춤
+        gaps = self.ladder_gaps.pop(folder_name, [])
+        for segment_prefix, duration in gaps:
+            self.append_m3u8_entry(folder_name, segment_prefix, duration,
+                                   next_risk_level=next_risk_level, endlist=endlist, gap=True)
+
+        if self.subtitle_writer is not None and temp_folders:
+            suffix = "_privacy" if bool_privacy else ""
+            ts_path = self.output_dir + "/" + f"{temp_folders[0][0]}_{int(file_index):04d}{suffix}.ts"
+            subtitle_appended = self.subtitle_writer.append(int(file_index), ts_path, endlist=endlist)
+        else:
+            subtitle_appended = False
+
+        if self.manifest is not None:
+            suffix = "_privacy" if bool_privacy else ""
+            names = [f"{segment_prefix}{suffix}.m3u8" for segment_prefix in
+                     [segment_prefix for segment_prefix, _, _ in temp_folders] + [segment_prefix for segment_prefix, _ in gaps]]
+            writers = {name: self.get_m3u8_writer(self.output_dir + "/" + name) for name in names}
+            if subtitle_appended:
+                writers[self.subtitle_writer.playlist_name] = self.subtitle_writer.writer
+            self.manifest.append(folder_name, writers)
+        return file_index
+
+    def close_m3u8_files(self, encoding_list, privacy=False):
+        # 라이브 모드 종료 시 각 해상도 m3u8에 #EXT-X-ENDLIST 추가
+        for segment_prefix, _, _ in encoding_list:
+            if privacy == True:
+                output_m3u8_path = self.output_dir+"/"+ f"{segment_prefix}_privacy.m3u8"
+            else:
+                output_m3u8_path = self.output_dir+"/"+ f"{segment_prefix}.m3u8"
+            writer = self.m3u8_writers.get(output_m3u8_path)
+            if writer is not None and writer.header:
+                writer.publish(endlist=True)
+        if self.subtitle_writer is not None:
+            self.subtitle_writer.close()
\ No newline at end of file
@@ -1,29 +1,296 @@
 # semanticEncoder_sub.py
 
 # 파일명 변경
+from raPreprocessor_sub import *
 from raEncoder_sub import * 
+import math
 import numpy as np
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 class semanticEncoder ():
-    def __init__ (self, input_dir_pre, output_dir_pre, fps, max_chunk_duration, semantic_fname, input_dir_encode, output_dir_encode_temp, output_dir_encode_main):
-        self.prepro = SemantPreprocessor(input_dir_pre, output_dir_pre, fps, max_chunk_duration, semantic_fname)
-        self.encoder = SemantEncoder(input_dir_encode, output_dir_encode_temp, output_dir_encode_main, fps)
+    def __init__ (self, input_dir_pre, output_dir_pre, fps, max_chunk_duration, semantic_fname, input_dir_encode, output_dir_encode_temp, output_dir_encode_main,
+                  segment_mode="fixed", min_chunk_duration=0.5, lookahead_segments=1):
+        # segment_mode="risk": 세그먼트 경계를 risk/level 전환 프레임에 맞춤 (min_chunk_duration~max_chunk_duration 초,
+        # encoding_all/encoding_pipeline에 적용되고 encoding_realtime은 max_chunk_duration 고정 길이)
+        self.prepro = SemantPreprocessor(input_dir_pre, output_dir_pre, fps, max_chunk_duration, semantic_fname,
+                                         segment_mode=segment_mode, min_chunk_duration=min_chunk_duration)
+        self.encoder = SemantEncoder(input_dir_encode, output_dir_encode_temp, output_dir_encode_main, fps,
+                                     target_duration=math.ceil(max_chunk_duration),
+                                     lookahead_segments=lookahead_segments, segment_mode=segment_mode)
         self.output_dir_pre = output_dir_pre 
         
-    def encoding_all (self, enable_pre = True, start_frame=0, end_frame=None):
+    def encoding_all (self, enable_pre = True, start_frame=0, end_frame=None, resume=False, pipeline=False,
+                      preprocess_workers=1, **pipeline_options):
+        # resume=True: 중단된 이전 실행의 encode_manifest.jsonl부터 이어서 인코딩 (SemantEncoder.encoding 참고)
+        # pipeline=True: 전처리와 인코딩을 세그먼트 단위로 겹쳐 실행 (encoding_pipeline, 옵션은 그대로 전달)
+        # preprocess_workers > 1: 세그먼트 프레임 배치를 스레드 풀에서 병렬로 실행
+        if enable_pre and pipeline:
+            return self.encoding_pipeline(start_frame=start_frame, end_frame=end_frame,
+                                          preprocess_workers=preprocess_workers, **pipeline_options)
+
         folder_names = None
         vtt_cues = None 
         if enable_pre == True:
-            folder_names, vtt_cues = self.prepro.preProcessing_all(start_frame=start_frame, end_frame=end_frame)
+            folder_names, vtt_cues = self.prepro.preProcessing_all(start_frame=start_frame, end_frame=end_frame,
+                                                                   workers=preprocess_workers)
         else:
             folder_names = np.load( self.output_dir_pre+'/foldername.npy')
             print("[!] Preprocessing skipped. Subtitles will not be generated.")
             vtt_cues = [] 
 
         if folder_names is not None and len(folder_names) > 0:
-            self.encoder.encoding(folder_names, vtt_cues)
+            self.encoder.encoding(list(folder_names), vtt_cues, resume=resume)
         else:
             print("[!] No segments to encode. Please check your frame range and preprocessing results.")
     
-    def encoding_realtime(self):
-        pass
\ No newline at end of file
+    def encoding_pipeline(self, start_frame=0, end_frame=None,
+                          encoding_list = [("1080p","scale=1920:1080", "5000k" ),
+                                           ("480p","scale=854:480",   "1400k" ),
+                                           ("144p","scale=256:144",   "250k" )],
+                          single_pass=False, direct=False,
+                          preprocess_workers=1, encode_workers=1, queue_size=4):
+        # 전처리 → 인코딩 → m3u8 게시를 세그먼트 단위로 겹쳐 실행 (전체 전처리가 끝날 때까지 인코더가 놀지 않음)
+        # 세그먼트 라벨(폴더 이름, NEXT-SEMANTICLEVEL)은 CSV에서 먼저 한 번에 계산하고, 각 세그먼트는
+        # 전처리 풀(preprocess_workers) → 인코딩 풀(encode_workers) → 현재 스레드(순서대로 게시)로 흘러감.
+        # 단계 사이에 쌓이는 세그먼트는 queue_size 개로 제한하여 전처리가 인코딩보다 너무 앞서 나가지 않도록 함
+        t_start = time.time()
+        frames, risk, level = self.prepro.load_semantic_table(start_frame=start_frame, end_frame=end_frame)
+        starts, ends = self.prepro.segment_bounds(risk, level)
+        seg_risk, seg_level = self.prepro.segment_labels(risk, level, (starts, ends))
+        n_segments = len(seg_risk)
+        if n_segments == 0:
+            print("[!] No segments to encode. Please check your frame range and preprocessing results.")
+            return None
+
+        self.prepro.folder_init()
+        if self.encoder.encode_cache is not None and not direct:
+            print("[i] Encode cache reuses final .ts outputs, switching to direct mode.")
+            direct = True
+        if not direct:
+            self.encoder.folder_init(self.encoder.output_dir_temp)
+        self.encoder.folder_init(self.encoder.output_dir)
+        subtitle_filename = self.encoder.init_subtitles([self.prepro.make_vtt_cue(k + 1, seg_risk[k], ends[k] - starts[k],
+                                                                                 start_frame=starts[k])
+                                                         for k in range(n_segments)])
+        if self.encoder.ladder_policy is not None:
+            self.encoder.create_init_m3u8(self.encoder.ladder_policy.playlist_info(encoding_list), subtitle_path=subtitle_filename)
+        else:
+            self.encoder.create_init_m3u8(subtitle_path=subtitle_filename)
+
+        def preprocess(k):
+            start, end = starts[k], ends[k]
+            chunk = list(zip(frames[start:end], risk[start:end], level[start:end]))
+            return self.prepro.splitChunk(chunk, k + 1, label=(seg_risk[k], seg_level[k]))
+
+        prepared = deque()  # 전처리 중인 세그먼트 (future → folder_name)
+        encoding = deque()  # 인코딩 중인 세그먼트 (folder_name, future → temp_folders)
+        folder_names = []
+        next_k = 0
+        first_segment_s = None
+
+        with ThreadPoolExecutor(max_workers=max(1, preprocess_workers)) as preprocess_pool, \
+             ThreadPoolExecutor(max_workers=max(1, encode_workers)) as encode_pool:
+            try:
+                while len(folder_names) < n_segments:
+                    while next_k < n_segments and len(prepared) < queue_size:
+                        prepared.append(preprocess_pool.submit(preprocess, next_k))
+                        next_k += 1
+                    while prepared and prepared[0].done() and len(encoding) < queue_size:
+                        folder_name = prepared.popleft().result()
+                        encoding.append((folder_name, encode_pool.submit(
+                            self.encoder.encode_segment, folder_name, encoding_list, single_pass, direct)))
+
+                    if encoding and encoding[0][1].done():
+                        folder_name, future = encoding.popleft()
+                        k = len(folder_names)
+                        next_risk_level = self.encoder.semantic_lookahead(
+                            seg_level[k + 1:k + 1 + self.encoder.lookahead_segments])
+                        self.encoder.commit_segment(folder_name, future.result(), next_risk_level)
+                        folder_names.append(folder_name)
+                        if first_segment_s is None:
+                            first_segment_s = time.time() - t_start
+                            print(f"[✔] First segment published after {first_segment_s:.3f}s")
+                        continue
+
+                    # 맨 앞 세그먼트의 전처리나 인코딩 중 하나가 끝날 때까지 대기
+                    waiting = [encoding[0][1]] if encoding else []
+                    if prepared and len(encoding) < queue_size:
+                        waiting.append(prepared[0])
+                    wait(waiting, return_when=FIRST_COMPLETED)
+            except Exception:
+                for future in list(prepared) + [future for _, future in encoding]:
+                    future.cancel()
+                raise
+
+        tail = len(frames) - int(ends[-1])
+        if tail > 0:
+            print(f"[i] Skipping last incomplete chunk with {tail} frames.")
+        np.save(self.prepro.output_dir / 'foldername.npy', np.array(folder_names))
+
+        stats = {"segments": n_segments, "first_segment_s": first_segment_s, "total_s": time.time() - t_start}
+        print(f"[✔] Pipeline finished: {n_segments} segments in {stats['total_s']:.3f}s "
+              f"(first segment after {first_segment_s:.3f}s)")
+        return stats
+
+    def encoding_realtime(self, start_frame=0, poll_interval=0.1, idle_timeout=10.0, lookahead_timeout=1.0,
+                          max_segments=None, playlist_window=None,
+                          encoding_list = [("1080p","scale=1920:1080", "5000k" ),
+                                           ("480p","scale=854:480",   "1400k" ),
+                                           ("144p","scale=256:144",   "250k" )],
+                          single_pass=True, direct=False, persistent=False):
+        # 라이브 모드: input/frame 에 도착하는 프레임과 계속 추가되는 CSV를 감시하면서
+        # max_images 개의 프레임과 risk 행이 모이는 즉시 세그먼트를 잘라 인코딩하고 m3u8에 이어붙임.
+        # 세그먼트는 다음 세그먼트 첫 행이 CSV에 들어오는 순간 NEXT-SEMANTICLEVEL과 함께 게시되고,
+        # lookahead_timeout 안에 들어오지 않으면 NEXT-SEMANTICLEVEL 없이 게시됨 (지연 상한).
+        # encoder.lookahead_segments > 1이면 그때까지 CSV에 들어온 행으로 알 수 있는 만큼 SEMANTIC-FORECAST도 게시
+        # (forecast를 채우려고 더 기다리지는 않음)
+        # persistent=True: 세그먼트마다 ffmpeg를 띄우지 않고 PersistentSegmenter 하나에 프레임을 계속 흘려 넣음
+        # (세그먼트는 다음 세그먼트 프레임이 들어와 닫히는 순간 게시되므로 lookahead_timeout은 쓰지 않음)
+        # persistent=True이고 encoder.part_duration이 있으면 (LL-HLS) 세그먼트가 다 모이기를 기다리지 않고
+        # part 길이만큼 프레임이 모일 때마다 인코더에 넣어 part와 PRELOAD-HINT를 바로 게시
+        # (세그먼트 라벨은 첫 프레임 행에서 정해지므로 세그먼트 첫 part부터 SEMANTIC 태그가 게시됨)
+        max_images = self.prepro.max_images
+        self.encoder.playlist_window = playlist_window  # 예: 60 → 최근 60개 세그먼트만 m3u8에 유지
+        self.prepro.folder_init()
+        if not direct:
+            self.encoder.folder_init(self.encoder.output_dir_temp)
+        self.encoder.folder_init(self.encoder.output_dir)
+        # 라이브에서는 같은 문구 구간이 언제 끝날지 모르므로 cue를 합치지 않고 세그먼트 단위 WebVTT 조각으로 게시
+        subtitle_filename = self.encoder.init_subtitles(merge=False)
+        if self.encoder.ladder_policy is not None:
+            self.encoder.create_init_m3u8(self.encoder.ladder_policy.playlist_info(encoding_list),
+                                          subtitle_path=subtitle_filename)
+        else:
+            self.encoder.create_init_m3u8(subtitle_path=subtitle_filename)
+
+        rows = []
+        skip_rows = start_frame
+        folder_index = 0
+        pending = None
+        segmenter = None
+        if persistent:
+            segmenter = PersistentSegmenter(self.encoder, encoding_list, segment_time=max_images / self.encoder.framerate,
+                                            endlist=False)
+        glass_times = {}
+        open_rows = []  # LL-HLS: 인코더에 넣고 있는 세그먼트의 행
+        latencies = []
+        frames_published = 0
+        t_first = None
+        t_last = None
+        last_activity = time.time()
+
+        def published(folder_name, glass_time):
+            nonlocal frames_published, t_last
+            t_last = time.time()
+            frames_published += max_images
+            latency = t_last - glass_time
+            latencies.append(latency)
+            print(f"[✔] Live segment {folder_name} published, glass-to-playlist {latency:.3f}s")
+
+        def publish(pending, next_risk_level):
+            folder_name, temp_folders, glass_time, _ = pending
+            self.encoder.commit_segment(folder_name, temp_folders, next_risk_level, endlist=False)
+            published(folder_name, glass_time)
+
+        print(f"[▶] Live encoding: watching {self.prepro.input_dir} (idle timeout {idle_timeout}s)")
+        try:
+            while max_segments is None or folder_index < max_segments or open_rows:
+                new_rows = self.prepro.poll_semantic_rows()
+                if skip_rows > 0:
+                    dropped = min(skip_rows, len(new_rows))
+                    new_rows = new_rows[dropped:]
+                    skip_rows -= dropped
+                if new_rows:
+                    rows.extend(new_rows)
+                    last_activity = time.time()
+
+                if pending is not None and rows:
+                    # CSV에 이미 들어온 행으로 알 수 있는 다음 세그먼트들의 (첫 행) level
+                    publish(pending, self.encoder.semantic_lookahead(
+                        row[2] for row in rows[:self.encoder.lookahead_segments * max_images:max_images]))
+                    pending = None
+                elif pending is not None and time.time() - pending[3] > lookahead_timeout:
+                    publish(pending, None)
+                    pending = None
+                elif segmenter is not None:
+                    for closed_name in segmenter.commit_closed():
+                        published(closed_name, glass_times.pop(closed_name))
+
+                n_batch = min(segmenter.part_frames, max_images - len(open_rows)) if segmenter is not None and \
+                    segmenter.part_frames else 0
+                if n_batch and len(rows) >= n_batch and self.prepro.frames_ready(rows[:n_batch]):
+                    batch = rows[:n_batch]
+                    del rows[:n_batch]
+                    if not open_rows:
+                        folder_index += 1
+                        glass_time = self.prepro.frame_arrival_time(batch[0][0])
+                        if t_first is None:
+                            t_first = glass_time
+                    _, risk, level = (open_rows or batch)[0]
+                    for file_index, (filename, _, _) in enumerate(batch, start=len(open_rows)):
+                        folder_name = self.prepro.splitSegemnt(filename, risk, level, folder_index, file_index,
+                                                               new_folder=file_index == 0)
+                    glass_times.setdefault(folder_name, glass_time)
+                    frame_paths = sorted((self.prepro.output_dir / folder_name).glob("frame*.jpg"))[len(open_rows):]
+                    if len(open_rows) + n_batch >= max_images:
+                        self.encoder.subtitle_writer.add_cues(
+                            [self.prepro.make_vtt_cue(folder_index, folder_name.split("_")[-2], max_images)])
+                        open_rows = []
+                    else:
+                        open_rows = open_rows + batch
+                    for closed_name in segmenter.feed(folder_name, frame_paths):
+                        published(closed_name, glass_times.pop(closed_name))
+                    last_activity = time.time()
+                    continue
+
+                if not n_batch and len(rows) >= max_images and self.prepro.frames_ready(rows[:max_images]):
+                    chunk = rows[:max_images]
+                    del rows[:max_images]
+                    glass_time = self.prepro.frame_arrival_time(chunk[0][0])
+                    if t_first is None:
+                        t_first = glass_time
+
+                    folder_index += 1
+                    folder_name = self.prepro.splitChunk(chunk, folder_index)
+                    self.encoder.subtitle_writer.add_cues(
+                        [self.prepro.make_vtt_cue(folder_index, folder_name.split("_")[-2], len(chunk))])
+                    if segmenter is not None:
+                        glass_times[folder_name] = glass_time
+                        frame_paths = sorted((self.prepro.output_dir / folder_name).glob("frame*.jpg"))
+                        for closed_name in segmenter.feed(folder_name, frame_paths):
+                            published(closed_name, glass_times.pop(closed_name))
+                    else:
+                        temp_folders = self.encoder.encode_segment(folder_name, encoding_list, single_pass, direct)
+                        pending = (folder_name, temp_folders, glass_time, time.time())
+                    last_activity = time.time()
+                    continue
+
+                if time.time() - last_activity > idle_timeout:
+                    print(f"[i] No new frames for {idle_timeout}s, stopping live encoding.")
+                    break
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            print("[i] Live encoding interrupted.")
+
+        if pending is not None:
+            publish(pending, None)
+        if segmenter is not None:
+            if open_rows:
+                self.encoder.subtitle_writer.add_cues(
+                    [self.prepro.make_vtt_cue(folder_index, open_rows[0][1], len(open_rows))])
+            for closed_name in segmenter.close():
+                published(closed_name, glass_times.pop(closed_name))
+        if folder_index > 0:
+            self.encoder.close_m3u8_files(encoding_list)
+
+        stats = {"segments": folder_index, "frames": frames_published}
+        if latencies:
+            elapsed = t_last - t_first
+            stats["fps"] = frames_published / elapsed if elapsed > 0 else 0.0
+            stats["latency_avg"] = sum(latencies) / len(latencies)
+            stats["latency_max"] = max(latencies)
+            print(f"[✔] Live encoding finished: {folder_index} segments, {stats['fps']:.1f} frames/sec sustained, "
+                  f"glass-to-playlist avg {stats['latency_avg']:.3f}s / max {stats['latency_max']:.3f}s")
+        return stats
\ No newline at end of file
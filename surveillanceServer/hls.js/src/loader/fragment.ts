@@ -226,6 +226,7 @@ export class Fragment extends BaseSegment {
   public semanticLevel?: number; //? 선택적 추가
   public privacy?: number; //? 선택적 추가
   public nextSemanticLevel?: number; //? 선택적 추가
+  public semanticForecast?: number[]; //? 다음 N개 세그먼트의 semantic level (가까운 순)
 
   constructor(type: PlaylistLevelType, base: Base | string) {
     super(base);
@@ -60,7 +60,7 @@ const LEVEL_PLAYLIST_REGEX_FAST = new RegExp(
 
 const LEVEL_PLAYLIST_REGEX_SLOW = new RegExp(
   [
-    /#EXT-X-(PROGRAM-DATE-TIME|BYTERANGE|DATERANGE|DEFINE|KEY|MAP|PART|PART-INF|PLAYLIST-TYPE|PRELOAD-HINT|RENDITION-REPORT|SERVER-CONTROL|SKIP|START|SEMANTICLEVEL|SEMANTICTYPE|PRIVACY|NEXT-SEMANTICLEVEL):(.+)/
+    /#EXT-X-(PROGRAM-DATE-TIME|BYTERANGE|DATERANGE|DEFINE|KEY|MAP|PART|PART-INF|PLAYLIST-TYPE|PRELOAD-HINT|RENDITION-REPORT|SERVER-CONTROL|SKIP|START|SEMANTICLEVEL|SEMANTICTYPE|PRIVACY|NEXT-SEMANTICLEVEL|SEMANTIC-FORECAST):(.+)/
       .source, // UPDATE SEMANTICLEVEL TAGS
     /#EXT-X-(BITRATE|DISCONTINUITY-SEQUENCE|MEDIA-SEQUENCE|TARGETDURATION|VERSION): *(\d+)/
       .source,
@@ -718,6 +718,17 @@ export default class M3U8Parser {
             }
             break;
           }
+          // Upcoming segments' semantic levels, nearest first (e.g. "1,2,2")
+          case 'SEMANTIC-FORECAST': {
+            const semanticForecast = value1.split(',').map(parseFloat);
+            if (semanticForecast.every(Number.isFinite)) {
+              frag.semanticForecast = semanticForecast;
+              frag.tagList.push(['EXT-X-SEMANTIC-FORECAST', value1]);
+            } else {
+              logger.warn(`Invalid EXT-X-SEMANTIC-FORECAST tag: "${value1}"`);
+            }
+            break;
+          }
 
           default:
             logger.warn(`line parsed but not handled: ${result}`);